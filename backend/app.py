@@ -8,8 +8,12 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_smorest import Api
 from datetime import datetime
-import logging
-from logging.handlers import RotatingFileHandler
+import httpx
+
+import db
+import metrics
+import request_log
+from pagination import CursorError
 
 from routes.admin import admin_bp
 from routes.stall import stall_bp
@@ -41,17 +45,7 @@ def create_app(config_name=None):
     return app
 
 def setup_logging(app):
-    app.logger.setLevel(logging.INFO)
-
-    handler = logging.StreamHandler()
-    handler.setLevel(logging.INFO)
-    handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s'
-    ))
-
-    if not app.logger.handlers:
-        app.logger.addHandler(handler)
-
+    request_log.setup_logging(app)
     app.logger.info("Logging initialized")
 
 
@@ -75,7 +69,7 @@ def setup_cors(app):
         supports_credentials=True,
         allow_headers=["Content-Type", "Authorization", "X-Visitor-Wallet-ID"],
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-        expose_headers=["Content-Type", "Authorization"]
+        expose_headers=["Content-Type", "Authorization", "X-Next-Cursor", "X-Latest-Cursor", "X-Has-More", "ETag"]
     )
 
 
@@ -140,11 +134,6 @@ def register_blueprints(app):
     @app.route("/api/<path:path>", methods=['OPTIONS'])
     def handle_options(path):
         """Handle all OPTIONS requests for CORS preflight"""
-        app.logger.info(f'Handling OPTIONS preflight for: /api/{path}')
-        app.logger.info(f'Origin: {request.headers.get("Origin")}')
-        app.logger.info(f'Access-Control-Request-Method: {request.headers.get("Access-Control-Request-Method")}')
-        app.logger.info(f'Access-Control-Request-Headers: {request.headers.get("Access-Control-Request-Headers")}')
-        
         response = jsonify({"message": "CORS preflight OK"})
         origin = request.headers.get('Origin')
         
@@ -155,12 +144,14 @@ def register_blueprints(app):
             response.headers['Access-Control-Allow-Headers'] = 'Content-Type, content-type, Authorization, Accept, Origin, X-Requested-With, X-Visitor-Wallet-ID'
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS, PATCH'
             response.headers['Access-Control-Max-Age'] = '86400'  # Cache preflight for 24 hours
-            app.logger.info(f'Set CORS headers for origin: {origin}')
         else:
-            app.logger.warning(f'Rejected CORS preflight for origin: {origin}')
+            app.logger.debug('Rejected CORS preflight for origin: %s', origin)
             
         return response
 
+    # Prometheus scrape target, aggregated across gunicorn workers
+    app.add_url_rule("/metrics", "metrics", metrics.metrics_view)
+
     @app.route("/api/health")
     def health():
         return jsonify({
@@ -230,6 +221,21 @@ def register_error_handlers(app):
             "status_code": 404
         }), 404
 
+    @app.errorhandler(CursorError)
+    def invalid_page_params(error):
+        return jsonify({"error": str(error)}), 400
+
+    @app.errorhandler(httpx.TransportError)
+    def database_unavailable(error):
+        app.logger.warning(f'Database unavailable: {type(error).__name__}: {error}')
+        response = jsonify({
+            "error": "Service Unavailable",
+            "message": "Database temporarily unavailable, please retry",
+            "status_code": 503
+        })
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
     @app.errorhandler(500)
     def internal_error(error):
         app.logger.error(f'Server Error: {error}')
@@ -242,6 +248,13 @@ def register_error_handlers(app):
 
 def register_middleware(app):
     """Register middleware functions"""
+
+    @app.before_request
+    def before_request():
+        # Start the per-request database deadline and query timings
+        db.start_request()
+        request_log.start_request()
+        metrics.start_request()
     
     @app.after_request
     def after_request(response):
@@ -249,6 +262,12 @@ def register_middleware(app):
         response.headers['X-Content-Type-Options'] = 'nosniff'
         response.headers['X-Frame-Options'] = 'DENY'
         response.headers['X-XSS-Protection'] = '1; mode=block'
+
+        # Expose database time so slow endpoints show up in browser devtools
+        queries = db.query_stats()
+        if queries:
+            total_ms = sum(q["ms"] for q in queries)
+            response.headers['Server-Timing'] = f'db;dur={total_ms:.1f};desc="{len(queries)} queries"'
         
         # Add explicit CORS headers for debugging
         origin = request.headers.get('Origin')
@@ -257,13 +276,17 @@ def register_middleware(app):
             response.headers['Access-Control-Allow-Credentials'] = 'true'
             response.headers['Access-Control-Allow-Headers'] = 'Content-Type, content-type, Authorization, Accept, Origin, X-Requested-With, X-Visitor-Wallet-ID'
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS, PATCH'
-            app.logger.info(f'Added explicit CORS headers for origin: {origin}')
-        
-        if not app.debug:
-            app.logger.info(f'Response: {response.status_code}')
-        
+
+        # Sampled structured access log (errors and slow requests always)
+        request_log.log_request(response)
+        metrics.observe_request(response)
+
         return response
 
+    @app.teardown_request
+    def teardown_request(error=None):
+        metrics.end_request()
+
 
 # Create the application instance for Render auto-detection
 app = create_app()
@@ -6,12 +6,179 @@ from functools import wraps
 from flask import request, jsonify
 import jwt
 import os
+import hmac
+import time
+import uuid
+import base64
+import hashlib
+import logging
+import secrets
+import threading
 from datetime import datetime, timedelta, timezone
 
+from postgrest.exceptions import APIError
+
+from supabase_client import supabase
+from db import safe_execute
+from cache import TTLCache, get_assignments
+
+logger = logging.getLogger(__name__)
+
 JWT_SECRET = os.getenv("JWT_SECRET", "dev_secret")
 JWT_ALGORITHM = "HS256"
 JWT_LEEWAY_SECONDS = 10  # small clock skew tolerance
 
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "60"))
+# Used instead while refresh_tokens (sql/008) is not deployed, so clients
+# are not sent back to a bcrypt login every ACCESS_TOKEN_MINUTES
+NO_REFRESH_ACCESS_TOKEN_MINUTES = int(os.getenv("NO_REFRESH_ACCESS_TOKEN_MINUTES", "300"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
+
+# Verified tokens -> request.user; each entry expires with its token
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=0)
+
+# How stale this worker's copy of revoked_tokens may get
+REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "30"))
+# The reload runs off the request thread with its own budget
+REVOCATION_QUERY_TIMEOUT = 10
+
+# PostgREST codes for a missing table
+MISSING_RELATION_CODES = {"42P01", "PGRST205"}
+
+
+class RevocationList:
+    """
+    Revoked token ids (jti). Logout writes to the revoked_tokens table
+    (sql/007); each worker keeps a local copy that a background thread
+    reloads every REVOCATION_REFRESH_SECONDS, so checks never wait on the
+    database. Without the table, revocation only applies to the worker
+    that handled the logout.
+    """
+
+    def __init__(self, refresh_seconds=REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._revoked = {}  # jti -> exp (unix seconds)
+        self._loaded_at = 0.0
+        # Guards _revoked updates and the refresh flag
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._shared = True
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self._maybe_refresh()
+        exp = self._revoked.get(jti)
+        return exp is not None and exp > time.time()
+
+    def revoke(self, jti, exp):
+        """Revoke a token id until its expiry (unix seconds)."""
+        if not jti:
+            return
+        with self._lock:
+            self._revoked[jti] = exp
+        if not self._shared:
+            return
+        try:
+            safe_execute(supabase.table("revoked_tokens").upsert({
+                "jti": jti,
+                "expires_at": datetime.fromtimestamp(exp, tz=timezone.utc).isoformat()
+            }))
+        except APIError as e:
+            if not self._missing(e):
+                raise
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < self.refresh_seconds:
+                return
+            self._loaded_at = time.monotonic()
+            if not self._shared:
+                # Local only: just forget tokens that have expired anyway
+                now_ts = time.time()
+                self._revoked = {j: e for j, e in self._revoked.items() if e > now_ts}
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="revocation-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            now = datetime.now(tz=timezone.utc)
+            res = safe_execute(
+                supabase.table("revoked_tokens")
+                .select("jti, expires_at")
+                .gt("expires_at", now.isoformat()),
+                timeout=REVOCATION_QUERY_TIMEOUT
+            )
+            revoked = {
+                row["jti"]: datetime.fromisoformat(row["expires_at"]).timestamp()
+                for row in (res.data or [])
+            }
+            with self._lock:
+                # Keep local revocations that are not visible yet, including
+                # any made while the query was running
+                now_ts = time.time()
+                revoked.update({j: e for j, e in self._revoked.items() if e > now_ts and j not in revoked})
+                self._revoked = revoked
+        except APIError as e:
+            if not self._missing(e):
+                logger.warning("Token revocation refresh failed: %s", e)
+        except Exception as e:
+            logger.warning("Token revocation refresh failed: %s", e)
+        finally:
+            self._refreshing = False
+
+    def _missing(self, e):
+        if e.code not in MISSING_RELATION_CODES:
+            return False
+        logger.warning("revoked_tokens not deployed, logout revocation is per worker")
+        self._shared = False
+        return True
+
+
+revocation_list = RevocationList()
+
+
+def verify_token(token):
+    """
+    Return the decoded claims for a valid, unrevoked token. Verified
+    tokens are cached until their exp, so repeat requests skip the
+    HMAC check and claim parsing. Raises jwt.InvalidTokenError.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(
+            token,
+            JWT_SECRET,
+            algorithms=[JWT_ALGORITHM],
+            leeway=JWT_LEEWAY_SECONDS
+        )
+        ttl = claims.get("exp", 0) - time.time()
+        if ttl > 0:
+            token_cache.set(token, claims, ttl=ttl)
+
+    if revocation_list.is_revoked(claims.get("jti")):
+        raise jwt.InvalidTokenError("Token revoked")
+    return claims
+
+
+def revoke_token(token):
+    """Revoke a verified token (logout) and drop it from the cache."""
+    claims = verify_token(token)
+    token_cache.delete(token)
+    revocation_list.revoke(claims.get("jti"), claims.get("exp", time.time()))
+
+
+def bearer_token():
+    """Token from the Authorization header, or None."""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split(" ", 1)[1].strip()
+
 
 def require_auth(roles=None):
     """
@@ -23,20 +190,13 @@ def require_auth(roles=None):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            auth_header = request.headers.get("Authorization", "")
+            token = bearer_token()
 
-            if not auth_header.startswith("Bearer "):
+            if token is None:
                 return jsonify({"error": "Missing or invalid Authorization header"}), 401
 
-            token = auth_header.split(" ", 1)[1].strip()
-
             try:
-                payload = jwt.decode(
-                    token,
-                    JWT_SECRET,
-                    algorithms=[JWT_ALGORITHM],
-                    leeway=JWT_LEEWAY_SECONDS
-                )
+                payload = verify_token(token)
             except jwt.ExpiredSignatureError:
                 return jsonify({"error": "Token expired"}), 401
             except jwt.InvalidTokenError:
@@ -46,7 +206,11 @@ def require_auth(roles=None):
             request.user = {
                 "id": payload.get("uid"),
                 "username": payload.get("username"),
-                "role": payload.get("role")
+                "role": payload.get("role"),
+                # Session context embedded at login (absent in older tokens)
+                "wallet_id": payload.get("wid"),
+                "stall_ids": payload.get("sids"),
+                "stall_version": payload.get("sv")
             }
 
             # Role-based access control
@@ -60,18 +224,186 @@ def require_auth(roles=None):
     return decorator
 
 
-def generate_token(user_id, role, username, expires_minutes=300):
+def generate_token(user_id, role, username, expires_minutes=None,
+                   wallet_id=None, stall_ids=None, stall_version=None):
     """
     Generate a signed JWT token.
+    wallet_id and, for operators, stall_ids with their stall_version
+    (see token_context) let handlers skip per-request lookups.
     """
     now = datetime.now(tz=timezone.utc)
+    if expires_minutes is None:
+        expires_minutes = ACCESS_TOKEN_MINUTES if _refresh_tokens else NO_REFRESH_ACCESS_TOKEN_MINUTES
 
     payload = {
         "uid": user_id,
         "username": username,
         "role": role,
+        "jti": uuid.uuid4().hex,
         "iat": now,
         "exp": now + timedelta(minutes=expires_minutes)
     }
+    if wallet_id:
+        payload["wid"] = wallet_id
+    if stall_ids is not None and stall_version is not None:
+        payload["sids"] = stall_ids
+        payload["sv"] = stall_version
 
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def token_context(user_id, role):
+    """
+    Keyword arguments for generate_token: the user's wallet_id and, for
+    operators, their assigned stalls. Lookup failures only drop the
+    context; handlers fall back to querying.
+    """
+    context = {}
+    try:
+        res = safe_execute(
+            supabase.table("wallets")
+            .select("id")
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        if res.data:
+            context["wallet_id"] = res.data[0]["id"]
+
+        if role == "operator":
+            stall_ids, version = get_assignments(user_id)
+            if version is not None:
+                context["stall_ids"] = stall_ids
+                context["stall_version"] = version
+    except Exception as e:
+        logger.warning("Token context lookup failed for %s: %s", user_id, e)
+    return context
+
+
+# =========================
+# Refresh tokens
+# =========================
+
+class RefreshTokenError(Exception):
+    """Refresh token is malformed, unknown, expired or revoked."""
+
+
+_refresh_tokens = True
+
+
+def _digest(secret):
+    raw = hashlib.sha256(secret.encode()).digest()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _split_refresh_token(token):
+    token_id, _, secret = (token or "").partition(".")
+    try:
+        uuid.UUID(token_id)
+    except ValueError:
+        raise RefreshTokenError("Invalid refresh token")
+    if not secret:
+        raise RefreshTokenError("Invalid refresh token")
+    return token_id, secret
+
+
+def issue_refresh_token(user_id):
+    """
+    Store and return a new refresh token ("<id>.<secret>"), or None
+    while the refresh_tokens table (sql/008) is not deployed.
+    """
+    global _refresh_tokens
+    if not _refresh_tokens:
+        return None
+
+    token_id = str(uuid.uuid4())
+    secret = secrets.token_urlsafe(32)
+    expires_at = datetime.now(tz=timezone.utc) + timedelta(days=REFRESH_TOKEN_DAYS)
+    try:
+        safe_execute(supabase.table("refresh_tokens").insert({
+            "id": token_id,
+            "user_id": user_id,
+            "token_hash": _digest(secret),
+            "expires_at": expires_at.isoformat()
+        }, returning="minimal"))
+    except APIError as e:
+        if e.code not in MISSING_RELATION_CODES:
+            raise
+        logger.warning("refresh_tokens not deployed, logins return access tokens only")
+        _refresh_tokens = False
+        return None
+    return f"{token_id}.{secret}"
+
+
+def redeem_refresh_token(token):
+    """
+    Validate and rotate a refresh token. Returns (user, new refresh
+    token) where user has id, username and role. Raises RefreshTokenError.
+    """
+    global _refresh_tokens
+    token_id, secret = _split_refresh_token(token)
+    if not _refresh_tokens:
+        raise RefreshTokenError("Refresh tokens are not enabled")
+
+    try:
+        res = safe_execute(
+            supabase.table("refresh_tokens")
+            .select("id, user_id, token_hash, expires_at, revoked_at, users(username, role)")
+            .eq("id", token_id)
+        )
+    except APIError as e:
+        if e.code not in MISSING_RELATION_CODES:
+            raise
+        logger.warning("refresh_tokens not deployed, logins return access tokens only")
+        _refresh_tokens = False
+        raise RefreshTokenError("Refresh tokens are not enabled")
+    row = res.data[0] if res.data else None
+
+    if not row or not hmac.compare_digest(row["token_hash"], _digest(secret)):
+        raise RefreshTokenError("Invalid refresh token")
+    if row.get("revoked_at"):
+        raise RefreshTokenError("Refresh token revoked")
+    if datetime.fromisoformat(row["expires_at"]) <= datetime.now(tz=timezone.utc):
+        raise RefreshTokenError("Refresh token expired")
+    if not row.get("users"):
+        raise RefreshTokenError("Invalid refresh token")
+
+    # Rotate: only one concurrent redeem of the same token can win
+    rotated = safe_execute(
+        supabase.table("refresh_tokens")
+        .update({"revoked_at": datetime.now(tz=timezone.utc).isoformat()})
+        .eq("id", token_id)
+        .is_("revoked_at", "null")
+    )
+    if not rotated.data:
+        raise RefreshTokenError("Refresh token revoked")
+
+    user = {
+        "id": row["user_id"],
+        "username": row["users"]["username"],
+        "role": row["users"]["role"]
+    }
+    return user, issue_refresh_token(row["user_id"])
+
+
+def revoke_refresh_token(token):
+    """Revoke a refresh token (logout). Unknown tokens are ignored."""
+    try:
+        token_id, secret = _split_refresh_token(token)
+    except RefreshTokenError:
+        return
+    global _refresh_tokens
+    if not _refresh_tokens:
+        return
+
+    try:
+        safe_execute(
+            supabase.table("refresh_tokens")
+            .update({"revoked_at": datetime.now(tz=timezone.utc).isoformat()})
+            .eq("id", token_id)
+            .eq("token_hash", _digest(secret))
+            .is_("revoked_at", "null")
+        )
+    except APIError as e:
+        if e.code not in MISSING_RELATION_CODES:
+            raise
+        _refresh_tokens = False
@@ -0,0 +1,102 @@
+"""
+Login throughput benchmark for POST /api/auth/login
+
+Fires logins from many client threads at one app instance (like one
+gthread gunicorn worker) and reports successful logins per second,
+latency percentiles and how many were shed with 503. PostgREST is
+faked with a fixed per-request delay and a real bcrypt hash, so the
+numbers reflect password verification cost and the executor limits:
+
+    python benchmarks/bench_login.py --clients 32 --logins 200
+    LOGIN_BCRYPT_WORKERS=4 LOGIN_BCRYPT_QUEUE=32 python benchmarks/bench_login.py
+
+Use the result to size LOGIN_BCRYPT_WORKERS and the number of gunicorn
+workers for the expected gate-opening rush.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USER_ID = "33333333-3333-3333-3333-333333333333"
+PASSWORD = "benchmark-password"
+
+
+def fake_postgrest(rtt_ms, password_hash):
+    import httpx
+
+    def handler(request):
+        time.sleep(rtt_ms / 1000)
+        return httpx.Response(200, json=[{
+            "id": USER_ID,
+            "username": "bench-visitor",
+            "password_hash": password_hash,
+            "role": "visitor"
+        }])
+
+    return httpx.MockTransport(handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent client threads")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated PostgREST latency")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost of the stored hash")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SUPABASE_URL", "http://postgrest.invalid")
+    os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    import bcrypt
+    import httpx
+    from app import create_app
+    from supabase_client import supabase
+    import passwords
+
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.rounds)).decode()
+    supabase.postgrest.session = httpx.Client(transport=fake_postgrest(args.rtt_ms, password_hash))
+
+    app = create_app()
+    app.logger.disabled = True
+    local = threading.local()
+    body = json.dumps({"username": "bench-visitor", "password": PASSWORD})
+
+    def login(_):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        start = time.perf_counter()
+        res = local.client.post("/api/auth/login", data=body, content_type="application/json")
+        return res.status_code, (time.perf_counter() - start) * 1000
+
+    print(f"POST /api/auth/login x{args.logins}, {args.clients} clients, bcrypt cost {args.rounds}, "
+          f"verify workers={passwords.VERIFY_WORKERS} queue={passwords.VERIFY_QUEUE_LIMIT}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - start
+
+    ok = sorted(ms for status, ms in results if status == 200)
+    shed = sum(1 for status, _ in results if status == 503)
+    other = len(results) - len(ok) - shed
+
+    print(f"elapsed={elapsed:.2f}s  ok={len(ok)}  shed(503)={shed}  other={other}")
+    if ok:
+        p95 = ok[max(0, int(len(ok) * 0.95) - 1)]
+        print(f"throughput={len(ok) / elapsed:.1f} logins/s  "
+              f"p50={statistics.median(ok):.0f}ms  p95={p95:.0f}ms  max={ok[-1]:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Microbenchmark of the require_auth decorator
+
+Times a decorated no-op view inside a request context, so the numbers are
+the decorator's own overhead: header parsing, JWT verification (or the
+verified-token cache lookup) and the role check.
+
+    python benchmarks/bench_require_auth.py --iterations 50000
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run(app, view, token, iterations, repeats):
+    headers = {"Authorization": f"Bearer {token}"}
+    per_call = []
+    with app.test_request_context("/bench", headers=headers):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                view()
+            per_call.append((time.perf_counter() - start) / iterations * 1e6)
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SUPABASE_URL", "http://postgrest.invalid")
+    os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+    from flask import Flask
+    import auth
+    from cache import TTLCache
+
+    # Revocation refresh would need the database
+    auth.revocation_list._shared = False
+
+    app = Flask(__name__)
+    view = auth.require_auth(["visitor"])(lambda: None)
+    token = auth.generate_token("33333333-3333-3333-3333-333333333333", "visitor", "bench-visitor")
+
+    print(f"require_auth x{args.iterations} (best of {args.repeats})")
+    results = {}
+    for name, size in (("no cache", 0), ("cache", auth.TOKEN_CACHE_SIZE)):
+        auth.token_cache = TTLCache(maxsize=size, ttl=0)
+        per_call = run(app, view, token, args.iterations, args.repeats)
+        results[name] = min(per_call)
+        print(f"{name:<9} best={min(per_call):6.2f}us/call  median={statistics.median(per_call):6.2f}us/call")
+
+    print(f"speedup   {results['no cache'] / results['cache']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Before/after latency benchmark for POST /api/stall/play
+
+Compares the legacy multi-query path (START_GAME_RPC=0) with the single
+round-trip start_game_checked RPC.
+
+Simulated mode (default) answers PostgREST from an in-process fake with a
+fixed per-request delay, so it runs without a database:
+
+    python benchmarks/bench_start_game.py --rtt-ms 40 --iterations 50
+
+Live mode runs against the Supabase project in .env. Use a visitor wallet
+that already has an active game: every check still runs, the request ends
+with 409 and nothing is written.
+
+    python benchmarks/bench_start_game.py --live --user-id <operator uuid> \\
+        --stall-id <stall uuid> --wallet <visitor wallet uuid>
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STALL_ID = "11111111-1111-1111-1111-111111111111"
+WALLET_ID = "22222222-2222-2222-2222-222222222222"
+USER_ID = "33333333-3333-3333-3333-333333333333"
+
+
+def fake_postgrest(rtt_ms, counter):
+    """httpx transport that mimics the rows start_game reads."""
+    import httpx
+
+    def handler(request):
+        time.sleep(rtt_ms / 1000)
+        counter["requests"] += 1
+        path = request.url.path.rsplit("/rest/v1/", 1)[-1]
+        single = "vnd.pgrst.object" in request.headers.get("accept", "")
+
+        if path == "rpc/start_game_checked":
+            body = {"transaction_id": "tx-1", "stall_name": "Ring Toss", "status": 201}
+        elif path == "rpc/start_game_play":
+            body = {"transaction_id": "tx-1"}
+        elif path == "stalls":
+            body = [{
+                "id": STALL_ID,
+                "stall_name": "Ring Toss",
+                "price_per_play": 10,
+                "wallet_id": WALLET_ID
+            }]
+        elif path == "wallets":
+            body = {"balance": 60, "is_active": True}
+        elif path == "transactions":
+            body = []
+        else:
+            body = [{"id": "row-1", "stall_id": STALL_ID}]
+
+        if single and isinstance(body, list):
+            body = body[0]
+        return httpx.Response(200, json=body)
+
+    return httpx.MockTransport(handler)
+
+
+def run(client, token, payload, iterations):
+    timings = []
+    status = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        res = client.post(
+            "/api/stall/play",
+            data=json.dumps(payload),
+            content_type="application/json",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        status = res.status_code
+    return timings, status
+
+
+def summarize(name, timings, status, round_trips=None):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    trips = f"  round trips/req={round_trips:.1f}" if round_trips is not None else ""
+    print(
+        f"{name:<8} status={status}  mean={statistics.mean(timings):7.1f}ms  "
+        f"p50={statistics.median(timings):7.1f}ms  p95={p95:7.1f}ms{trips}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="simulated PostgREST latency")
+    parser.add_argument("--live", action="store_true", help="use the real Supabase project")
+    parser.add_argument("--user-id", default=USER_ID)
+    parser.add_argument("--stall-id", default=STALL_ID)
+    parser.add_argument("--wallet", default=WALLET_ID)
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ.setdefault("SUPABASE_URL", "http://postgrest.invalid")
+        os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    from app import create_app
+    from auth import generate_token
+    from supabase_client import supabase
+    import routes.stall as stall
+
+    counter = {"requests": 0}
+    if not args.live:
+        import httpx
+        supabase.postgrest.session = httpx.Client(transport=fake_postgrest(args.rtt_ms, counter))
+
+    app = create_app()
+    app.logger.disabled = True
+    client = app.test_client()
+    token = generate_token(args.user_id, "operator", "bench-operator")
+    payload = {"visitor_wallet": args.wallet, "stall_id": args.stall_id}
+
+    print(f"POST /api/stall/play x{args.iterations} "
+          f"({'live' if args.live else f'simulated rtt={args.rtt_ms}ms'})")
+
+    for name, use_rpc in (("before", False), ("after", True)):
+        stall.START_GAME_RPC = use_rpc
+        counter["requests"] = 0
+        timings, status = run(client, token, payload, args.iterations)
+        trips = None if args.live else counter["requests"] / args.iterations
+        summarize(name, timings, status, trips)
+
+
+if __name__ == "__main__":
+    main()
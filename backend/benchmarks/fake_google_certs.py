@@ -0,0 +1,140 @@
+"""
+Local stand-in for Google's OAuth2 certificate endpoint
+
+Serves {kid: x509 PEM} like https://www.googleapis.com/oauth2/v1/certs,
+with a Cache-Control max-age, and mints ID tokens signed by the matching
+key, so Google sign-in can be exercised without network access:
+
+    from benchmarks.fake_google_certs import FakeGoogleCerts
+    import google_certs
+
+    with FakeGoogleCerts(max_age=3600) as fake:
+        google_certs.GOOGLE_CERTS_URL = fake.url
+        token = fake.mint("name.2024btech0001@vitbhopal.ac.in", audience="client-id")
+        google_certs.verify_google_id_token(token, "client-id")
+
+Run directly to simulate a login storm and count certificate fetches:
+
+    python benchmarks/fake_google_certs.py --logins 2000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeGoogleCerts:
+    """Threaded HTTP server on 127.0.0.1 serving one signing certificate."""
+
+    def __init__(self, max_age=3600, kid="fake-kid-1"):
+        self.max_age = max_age
+        self.kid = kid
+        self.fetches = 0
+
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fake-google-certs")])
+        now = datetime.now(tz=timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self._key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=1))
+            .sign(self._key, hashes.SHA256())
+        )
+        self._body = json.dumps({
+            kid: cert.public_bytes(serialization.Encoding.PEM).decode()
+        }).encode()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.fetches += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={fake.max_age}, must-revalidate")
+                self.send_header("Content-Length", str(len(fake._body)))
+                self.end_headers()
+                self.wfile.write(fake._body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/oauth2/v1/certs"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def mint(self, email, audience, hd="vitbhopal.ac.in", expires_in=3600):
+        """Return an RS256 ID token shaped like Google's."""
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com",
+            "aud": audience,
+            "sub": f"sub-{email}",
+            "email": email,
+            "email_verified": True,
+            "hd": hd,
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        return jwt.encode(claims, self._key, algorithm="RS256", headers={"kid": self.kid})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--max-age", type=int, default=3600)
+    args = parser.parse_args()
+
+    from concurrent.futures import ThreadPoolExecutor
+    import google_certs
+
+    audience = "fake-client-id"
+    with FakeGoogleCerts(max_age=args.max_age) as fake:
+        google_certs.GOOGLE_CERTS_URL = fake.url
+        tokens = [
+            fake.mint(f"student.2024btech{i:04d}@vitbhopal.ac.in", audience)
+            for i in range(args.logins)
+        ]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            verified = list(pool.map(lambda t: google_certs.verify_google_id_token(t, audience), tokens))
+        elapsed = time.perf_counter() - start
+
+    print(f"verified {len(verified)} ID tokens in {elapsed:.2f}s "
+          f"({len(verified) / elapsed:.0f}/s) with {fake.fetches} certificate fetch(es)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+PointX in-process caches
+Small per-worker TTL caches for rarely changing rows. Each gunicorn
+worker keeps its own copy; writes through the API evict entries and
+the TTL bounds staleness for changes made elsewhere.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from postgrest.exceptions import APIError
+
+from supabase_client import supabase
+from db import safe_execute
+from loaders import stall_loader, chunked
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are cached and fresh."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# =========================
+# Stall metadata
+# =========================
+
+STALL_CACHE_TTL = float(os.getenv("STALL_CACHE_TTL", "60"))
+STALL_CACHE_SIZE = int(os.getenv("STALL_CACHE_SIZE", "512"))
+
+stall_cache = TTLCache(maxsize=STALL_CACHE_SIZE, ttl=STALL_CACHE_TTL)
+
+
+def get_stalls(stall_ids):
+    """
+    Return {stall_id: row} with id, stall_name, price_per_play, wallet_id.
+    Misses are fetched in one batched query and cached.
+    """
+    stall_ids = [s for s in stall_ids if s]
+    found = stall_cache.get_many(stall_ids)
+
+    missing = [s for s in stall_ids if s not in found]
+    if missing:
+        for stall_id, row in stall_loader().load_many(missing).items():
+            stall_cache.set(stall_id, row)
+            found[stall_id] = row
+
+    return found
+
+
+def get_stall(stall_id):
+    """Return one stall row, or None if it does not exist."""
+    return get_stalls([stall_id]).get(stall_id)
+
+
+def invalidate_stall(stall_id=None):
+    """Evict one stall (or every stall) after a write."""
+    if stall_id is None:
+        stall_cache.clear()
+    else:
+        stall_cache.delete(stall_id)
+
+
+# =========================
+# Operator active sessions
+# =========================
+
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "10"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "2048"))
+
+session_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+
+
+def get_active_sessions(user_id):
+    """
+    Return the operator's active stall_sessions rows (stall_id, started_at).
+    Empty results are cached too so idle operators cost nothing to poll.
+    """
+    rows = session_cache.get(user_id)
+    if rows is None:
+        res = safe_execute(
+            supabase.table("stall_sessions")
+            .select("stall_id, started_at")
+            .eq("user_id", user_id)
+            .eq("is_active", True)
+        )
+        rows = res.data or []
+        session_cache.set(user_id, rows)
+    return rows
+
+
+def get_active_stall_ids(user_id):
+    """Return the stall IDs the operator is currently active for."""
+    return [s["stall_id"] for s in get_active_sessions(user_id)]
+
+
+def invalidate_sessions(user_id=None):
+    """Evict one operator (or every operator) after a session change."""
+    if user_id is None:
+        session_cache.clear()
+    else:
+        session_cache.delete(user_id)
+
+
+# =========================
+# Operator stall assignments
+# =========================
+
+# users.stall_version (sql/009) is bumped whenever a user's stall_operators
+# rows change. Operator tokens carry the assigned stall ids together with
+# the version they were read at; a token whose version no longer matches
+# falls back to stall_operators.
+STALL_VERSION_CACHE_TTL = float(os.getenv("STALL_VERSION_CACHE_TTL", str(SESSION_CACHE_TTL)))
+
+stall_version_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=STALL_VERSION_CACHE_TTL)
+
+# Undefined column: sql/009 not applied yet
+MISSING_COLUMN_CODES = {"42703", "PGRST204"}
+
+_stall_versions = True
+
+
+def get_stall_version(user_id):
+    """Current stall assignment version of a user, or None when not deployed."""
+    global _stall_versions
+    if not _stall_versions:
+        return None
+
+    version = stall_version_cache.get(user_id)
+    if version is None:
+        try:
+            res = safe_execute(
+                supabase.table("users")
+                .select("stall_version")
+                .eq("id", user_id)
+            )
+        except APIError as e:
+            if str(e.code) not in MISSING_COLUMN_CODES:
+                raise
+            logger.warning("users.stall_version missing, stall assignments are not embedded in tokens")
+            _stall_versions = False
+            return None
+        if not res.data:
+            return None
+        version = res.data[0]["stall_version"]
+        stall_version_cache.set(user_id, version)
+    return version
+
+
+def get_assignments(user_id):
+    """
+    Return (stall ids, version) for embedding in an operator token, or
+    (None, None) when assignment versions are not deployed.
+    """
+    # Version first: a change racing with this read bumps the version past
+    # the one returned, so the token is treated as stale rather than wrong
+    stall_version_cache.delete(user_id)
+    version = get_stall_version(user_id)
+    if version is None:
+        return None, None
+
+    res = safe_execute(
+        supabase.table("stall_operators")
+        .select("stall_id")
+        .eq("user_id", user_id)
+    )
+    return [row["stall_id"] for row in (res.data or [])], version
+
+
+def get_assigned_stall_ids(user):
+    """
+    Stall ids the operator (request.user) is assigned to: the token's
+    stall_ids while its stall_version is current, else stall_operators.
+    """
+    stall_ids = user.get("stall_ids")
+    version = user.get("stall_version")
+    if stall_ids is not None and version is not None and version == get_stall_version(user["id"]):
+        return stall_ids
+
+    res = safe_execute(
+        supabase.table("stall_operators")
+        .select("stall_id")
+        .eq("user_id", user["id"])
+    )
+    return [row["stall_id"] for row in (res.data or [])]
+
+
+def invalidate_stall_version(user_id=None):
+    """Evict one user's (or every user's) assignment version after a change."""
+    if user_id is None:
+        stall_version_cache.clear()
+    else:
+        stall_version_cache.delete(user_id)
+
+
+# =========================
+# Top-up proof hashes
+# =========================
+
+PROOF_HASH_CACHE_TTL = float(os.getenv("PROOF_HASH_CACHE_TTL", "86400"))
+PROOF_HASH_CACHE_SIZE = int(os.getenv("PROOF_HASH_CACHE_SIZE", "8192"))
+
+# Only hashes known to be taken are cached; a stored proof never becomes
+# reusable, so the TTL only bounds memory.
+proof_hash_cache = TTLCache(maxsize=PROOF_HASH_CACHE_SIZE, ttl=PROOF_HASH_CACHE_TTL)
+
+
+def is_known_proof(image_hash):
+    """True if a top-up request already uses this image hash."""
+    if proof_hash_cache.get(image_hash):
+        return True
+
+    res = safe_execute(
+        supabase.table("topup_requests")
+        .select("id")
+        .eq("image_hash", image_hash)
+        .limit(1)
+    )
+    if res.data:
+        proof_hash_cache.set(image_hash, True)
+        return True
+    return False
+
+
+def remember_proof(image_hash):
+    """Record a hash once its top-up request is stored."""
+    proof_hash_cache.set(image_hash, True)
+
+
+# =========================
+# Signed URLs for top-up proofs
+# =========================
+
+SIGNED_URL_EXPIRES = int(os.getenv("SIGNED_URL_EXPIRES", "3600"))
+# Re-sign this long before expiry so a handed-out URL is never about to lapse
+SIGNED_URL_REFRESH_MARGIN = int(os.getenv("SIGNED_URL_REFRESH_MARGIN", "600"))
+SIGNED_URL_CACHE_SIZE = int(os.getenv("SIGNED_URL_CACHE_SIZE", "4096"))
+SIGN_BATCH_SIZE = 100
+
+signed_url_cache = TTLCache(
+    maxsize=SIGNED_URL_CACHE_SIZE,
+    ttl=max(1, SIGNED_URL_EXPIRES - SIGNED_URL_REFRESH_MARGIN)
+)
+
+
+def get_signed_urls(paths, bucket="payments"):
+    """
+    Return {path: {"url", "expires_in"}} for objects in `bucket`.
+    Cached URLs are reused until the refresh margin; misses are signed
+    with one storage call per SIGN_BATCH_SIZE paths. Paths that fail to
+    sign are left out.
+    """
+    paths = [p for p in dict.fromkeys(paths) if p]
+    now = time.time()
+
+    found = {}
+    for (_, path), (url, expires_at) in signed_url_cache.get_many((bucket, p) for p in paths).items():
+        found[path] = {"url": url, "expires_in": int(expires_at - now)}
+
+    missing = [p for p in paths if p not in found]
+    for batch in chunked(missing, SIGN_BATCH_SIZE):
+        expires_at = time.time() + SIGNED_URL_EXPIRES
+        signed = supabase.storage.from_(bucket).create_signed_urls(batch, SIGNED_URL_EXPIRES)
+        for item in signed:
+            url = item.get("signedURL") or item.get("signedUrl")
+            if item.get("error") or not url:
+                continue
+            signed_url_cache.set((bucket, item["path"]), (url, expires_at))
+            found[item["path"]] = {"url": url, "expires_in": SIGNED_URL_EXPIRES}
+
+    return found
+
+
+def get_signed_url(path, bucket="payments"):
+    """Return {"url", "expires_in"} for one object, or None if signing failed."""
+    return get_signed_urls([path], bucket).get(path)
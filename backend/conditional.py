@@ -0,0 +1,83 @@
+"""
+PointX conditional GET helpers
+ETags for polled read endpoints. A tag either comes from a cheap row
+version probe (max row_version, see sql/005_row_versions.sql), letting the
+handler answer 304 before running its list and enrichment queries, or
+from a hash of the response body, which still saves the transfer.
+"""
+
+import json
+import hashlib
+import logging
+
+from flask import request, jsonify, current_app
+from postgrest.exceptions import APIError
+
+from db import safe_execute
+
+logger = logging.getLogger(__name__)
+
+# Undefined column: sql/005 not applied yet
+MISSING_COLUMN_CODES = {"42703", "PGRST204"}
+
+_row_versions = True
+
+
+def etag_for(*parts):
+    """Stable tag from version parts (ids, timestamps, query args)."""
+    raw = json.dumps(parts, default=str, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+
+def is_fresh(tag):
+    """True when the client's If-None-Match already has `tag`."""
+    return bool(tag) and request.if_none_match.contains_weak(tag)
+
+
+def _cache_headers(response, tag):
+    response.set_etag(tag, weak=True)
+    # Clients may keep the body but must revalidate on every poll
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(tag):
+    """Bodyless 304 for a version tag that matched."""
+    return _cache_headers(current_app.response_class(status=304), tag)
+
+
+def conditional_json(payload, status=200, headers=None, tag=None):
+    """
+    jsonify() with an ETag; answers 304 when If-None-Match matches.
+    Without `tag` the ETag is a hash of the serialized body.
+    """
+    response = jsonify(payload)
+    response.status_code = status
+    if headers:
+        response.headers.update(headers)
+    if tag is None:
+        tag = hashlib.sha1(response.get_data()).hexdigest()[:20]
+    return _cache_headers(response, tag).make_conditional(request)
+
+
+def row_version(query):
+    """
+    Return the newest row_version among the rows matched by `query`
+    (a builder already filtered, selecting "row_version"), "empty" when
+    nothing matches, or None when row versions are not deployed.
+    """
+    global _row_versions
+    if not _row_versions:
+        return None
+
+    try:
+        res = safe_execute(query.order("row_version", desc=True).limit(1))
+    except APIError as e:
+        if str(e.code) not in MISSING_COLUMN_CODES:
+            raise
+        logger.warning("row_version columns missing, ETags fall back to body hashes")
+        _row_versions = False
+        return None
+
+    rows = res.data or []
+    return rows[0]["row_version"] if rows else "empty"
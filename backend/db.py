@@ -0,0 +1,182 @@
+"""
+PointX data-access helpers
+Shared query execution for all blueprints: bounded, jittered retries
+and per-query timing.
+"""
+
+import os
+import time
+import random
+import logging
+
+import httpx
+from flask import g, has_request_context
+from postgrest.exceptions import APIError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Total time budget for database work inside one HTTP request.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("DB_REQUEST_DEADLINE_SECONDS", "5"))
+
+# Retry tuning: full-jitter exponential backoff capped at RETRY_MAX_DELAY.
+RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("DB_RETRY_BASE_DELAY", "0.1"))
+RETRY_MAX_DELAY = float(os.getenv("DB_RETRY_MAX_DELAY", "1.0"))
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+
+# The request never reached PostgREST, so retrying is always safe.
+CONNECT_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,  # stale keep-alive connection closed by server
+)
+
+# The request may have been applied, only retry reads.
+IN_FLIGHT_ERRORS = (
+    httpx.ReadTimeout,
+    httpx.WriteTimeout,
+    httpx.ReadError,
+    httpx.WriteError,
+)
+
+# PostgREST / Postgres codes for transient failures
+# (PGRST000-003: connection/pool problems, 40001/40P01: txn rolled back).
+RETRYABLE_API_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "40001", "40P01"}
+RETRYABLE_HTTP_STATUS = {"502", "503", "504", "520"}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """Raised when the request-level database budget is used up."""
+
+    def __init__(self, message="Database deadline exceeded"):
+        super().__init__(message)
+
+
+def start_request():
+    """Reset deadline and timing state; called from before_request."""
+    g.db_deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+    g.db_queries = []
+
+
+def query_stats():
+    """Return the per-query timings recorded during this request."""
+    if not has_request_context():
+        return []
+    return g.get("db_queries", [])
+
+
+def describe(query):
+    """
+    Return (method, label) for a postgrest builder,
+    e.g. ("GET", "wallets") or ("POST", "rpc/start_game_play").
+    """
+    req = getattr(query, "request", query)
+    method = str(getattr(req, "http_method", "") or "").upper()
+    path = str(getattr(req, "path", "") or "")
+    marker = "/rest/v1/"
+    if marker in path:
+        path = path.split(marker, 1)[1]
+    return method, path.strip("/") or "unknown"
+
+
+def is_retryable(exc, method):
+    """Classify an exception raised by query.execute()."""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, CONNECT_ERRORS):
+        return True
+    if isinstance(exc, IN_FLIGHT_ERRORS):
+        return method in IDEMPOTENT_METHODS
+    if isinstance(exc, httpx.TimeoutException):
+        return method in IDEMPOTENT_METHODS
+    if isinstance(exc, APIError):
+        code = str(exc.code or "")
+        if code in RETRYABLE_API_CODES:
+            return True
+        return code in RETRYABLE_HTTP_STATUS and method in IDEMPOTENT_METHODS
+    return False
+
+
+def _deadline(timeout):
+    if timeout is not None:
+        return time.monotonic() + timeout
+    if has_request_context() and "db_deadline" in g:
+        return g.db_deadline
+    return time.monotonic() + REQUEST_DEADLINE_SECONDS
+
+
+def _record(method, label, started, attempts, error=None):
+    elapsed_ms = (time.monotonic() - started) * 1000
+    entry = {
+        "method": method,
+        "target": label,
+        "ms": round(elapsed_ms, 2),
+        "attempts": attempts,
+        "error": type(error).__name__ if error else None,
+    }
+    if has_request_context():
+        g.setdefault("db_queries", []).append(entry)
+    metrics.observe_query(method, label, elapsed_ms / 1000, error)
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        logger.warning("SLOW QUERY %s %s %.1fms attempts=%d", method, label, elapsed_ms, attempts)
+    return entry
+
+
+def safe_execute(query, retries=None, timeout=None):
+    """
+    Execute a postgrest query with retries on transient failures.
+
+    Retries use full-jitter backoff and never sleep past the request
+    deadline; non-retryable errors (constraint violations, bad input,
+    timeouts on writes) are raised immediately.
+    """
+    retries = RETRY_ATTEMPTS if retries is None else max(1, retries)
+    deadline = _deadline(timeout)
+    method, label = describe(query)
+
+    # postgrest has its own blocking retry loop for GETs; keep retries here
+    # so they stay inside the deadline.
+    if hasattr(query, "retry"):
+        query = query.retry(False)
+
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        if time.monotonic() >= deadline:
+            error = DeadlineExceeded()
+            _record(method, label, started, attempt - 1, error)
+            raise error
+
+        try:
+            result = query.execute()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e, method):
+                _record(method, label, started, attempt, e)
+                raise
+
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+            if time.monotonic() + delay >= deadline:
+                _record(method, label, started, attempt, e)
+                raise
+
+            logger.info(
+                "RETRY %s %s after %s (attempt %d, sleeping %.3fs)",
+                method, label, type(e).__name__, attempt, delay
+            )
+            metrics.count_retry(method, label, e)
+            time.sleep(delay)
+            continue
+
+        _record(method, label, started, attempt)
+        return result
+
+
+__all__ = ["safe_execute", "start_request", "query_stats", "DeadlineExceeded"]
@@ -0,0 +1,213 @@
+"""
+PointX operator change feed
+One background thread per worker watches the stalls that connected
+operators subscribe to and fans changes out to their SSE streams:
+
+- pending_game: a new unscored play at the stall
+- score:        a pending play was scored
+- wallet:       the stall wallet balance changed
+
+Database load depends on the number of watched stalls and events, not
+on how many tablets are connected.
+"""
+
+import os
+import json
+import queue
+import logging
+import threading
+
+from supabase_client import supabase
+from db import safe_execute
+from loaders import chunked, Loader
+from cache import get_stalls
+
+logger = logging.getLogger(__name__)
+
+FEED_POLL_SECONDS = float(os.getenv("FEED_POLL_SECONDS", "2"))
+FEED_QUERY_TIMEOUT = 10
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Subscription:
+    """Queue of events for one SSE client."""
+
+    def __init__(self, stall_ids):
+        self.stall_ids = set(stall_ids)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Client is too slow; it will be told to resync from REST
+            self.overflowed = True
+
+
+class ChangeFeed:
+    """Shared per-worker poller for stall pending games and wallet balances."""
+
+    def __init__(self, interval=FEED_POLL_SECONDS):
+        self.interval = interval
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # stall_id -> {transaction_id: row}
+        self._pending = {}
+        # wallet_id -> balance
+        self._balances = {}
+
+    # ---------- subscriptions ----------
+
+    def subscribe(self, stall_ids):
+        sub = Subscription(stall_ids)
+        with self._lock:
+            self._subs.add(sub)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def notify(self):
+        """Poll now instead of waiting for the next tick (after a local write)."""
+        self._wake.set()
+
+    def _watched(self):
+        with self._lock:
+            subs = list(self._subs)
+        stall_ids = set()
+        for sub in subs:
+            stall_ids |= sub.stall_ids
+        return subs, stall_ids
+
+    def _publish(self, subs, stall_id, event):
+        for sub in subs:
+            if stall_id in sub.stall_ids:
+                sub.push(event)
+
+    # ---------- polling ----------
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+            subs, stall_ids = self._watched()
+            if not stall_ids:
+                # Forget state so a later subscriber starts from a fresh baseline
+                self._pending.clear()
+                self._balances.clear()
+                continue
+
+            try:
+                self.poll(subs, stall_ids)
+            except Exception:
+                logger.exception("Change feed poll failed")
+
+    def poll(self, subs, stall_ids):
+        stall_ids = sorted(stall_ids)
+        for stall_id in list(self._pending):
+            if stall_id not in stall_ids:
+                del self._pending[stall_id]
+
+        self._poll_games(subs, stall_ids)
+        self._poll_wallets(subs, stall_ids)
+
+    def _poll_games(self, subs, stall_ids):
+        current = {stall_id: {} for stall_id in stall_ids}
+        for ids in chunked(stall_ids):
+            res = safe_execute(
+                supabase.table("transactions")
+                .select("id, from_wallet, stall_id, created_at")
+                .in_("stall_id", ids)
+                .eq("type", "play")
+                .is_("score", "null"),
+                timeout=FEED_QUERY_TIMEOUT
+            )
+            for tx in (res.data or []):
+                current[tx["stall_id"]][tx["id"]] = tx
+
+        new_games = []
+        finished = []
+        for stall_id, games in current.items():
+            previous = self._pending.get(stall_id)
+            if previous is None:
+                # First sight of this stall: baseline only, no events
+                continue
+            new_games += [tx for tx_id, tx in games.items() if tx_id not in previous]
+            finished += [tx_id for tx_id in previous if tx_id not in games]
+
+        if new_games:
+            wallets = Loader("wallets").load_many(tx["from_wallet"] for tx in new_games)
+            for tx in new_games:
+                visitor = wallets.get(tx["from_wallet"])
+                self._publish(subs, tx["stall_id"], {
+                    "event": "pending_game",
+                    "data": {
+                        "transaction_id": tx["id"],
+                        "visitor_wallet": tx["from_wallet"],
+                        "visitor_username": visitor["username"] if visitor else "Unknown",
+                        "stall_id": tx["stall_id"],
+                        "created_at": tx["created_at"]
+                    }
+                })
+
+        for ids in chunked(finished):
+            res = safe_execute(
+                supabase.table("transactions")
+                .select("id, stall_id, score, points_amount")
+                .in_("id", ids),
+                timeout=FEED_QUERY_TIMEOUT
+            )
+            for tx in (res.data or []):
+                self._publish(subs, tx["stall_id"], {
+                    "event": "score",
+                    "data": {
+                        "transaction_id": tx["id"],
+                        "stall_id": tx["stall_id"],
+                        "score": tx.get("score"),
+                        "points_amount": tx.get("points_amount")
+                    }
+                })
+
+        self._pending = current
+
+    def _poll_wallets(self, subs, stall_ids):
+        stalls = get_stalls(stall_ids)
+        wallet_to_stall = {s["wallet_id"]: sid for sid, s in stalls.items() if s.get("wallet_id")}
+
+        for ids in chunked(sorted(wallet_to_stall)):
+            res = safe_execute(
+                supabase.table("wallets")
+                .select("id, balance")
+                .in_("id", ids),
+                timeout=FEED_QUERY_TIMEOUT
+            )
+            for wallet in (res.data or []):
+                previous = self._balances.get(wallet["id"])
+                self._balances[wallet["id"]] = wallet["balance"]
+                if previous is not None and previous != wallet["balance"]:
+                    stall_id = wallet_to_stall[wallet["id"]]
+                    self._publish(subs, stall_id, {
+                        "event": "wallet",
+                        "data": {
+                            "stall_id": stall_id,
+                            "wallet_id": wallet["id"],
+                            "balance": wallet["balance"]
+                        }
+                    })
+
+
+def format_sse(event):
+    """Serialize an event dict as a Server-Sent Events frame."""
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+change_feed = ChangeFeed()
@@ -0,0 +1,113 @@
+"""
+PointX Google ID token verification
+Google sign-ins share one requests session, and the certificate
+response is cached for as long as its Cache-Control max-age allows
+(several hours in practice). A login storm then costs one certificate
+fetch per expiry instead of one per login.
+"""
+
+import os
+import time
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+from google.auth import exceptions as google_exceptions
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+# Override to point at a local fake (see benchmarks/fake_google_certs.py)
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+CERT_FETCH_TIMEOUT = 10
+
+
+def cache_lifetime(headers):
+    """Seconds a response may be reused according to its cache headers."""
+    cache_control = headers.get("Cache-Control", "").lower()
+    directives = [d.strip() for d in cache_control.split(",") if d.strip()]
+    if "no-store" in directives or "no-cache" in directives:
+        return 0
+
+    for directive in directives:
+        if directive.startswith("max-age="):
+            try:
+                max_age = int(directive.split("=", 1)[1])
+                age = int(headers.get("Age", "0") or 0)
+            except ValueError:
+                return 0
+            return max(0, max_age - age)
+
+    if headers.get("Expires") and headers.get("Date"):
+        try:
+            expires = parsedate_to_datetime(headers["Expires"])
+            date = parsedate_to_datetime(headers["Date"])
+            return max(0, (expires - date).total_seconds())
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class CachingRequest(google_requests.Request):
+    """
+    google-auth transport that reuses one session and caches successful
+    GET responses for their cache lifetime. Concurrent misses for the
+    same URL wait for a single fetch.
+    """
+
+    def __init__(self, session=None):
+        super().__init__(session=session or requests.Session())
+        self._cache = {}  # url -> (expires_at, response)
+        self._lock = threading.Lock()
+
+    def _cached(self, url):
+        entry = self._cache.get(url)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=CERT_FETCH_TIMEOUT, **kwargs):
+        if method != "GET" or body is not None:
+            return super().__call__(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+        response = self._cached(url)
+        if response is not None:
+            return response
+
+        with self._lock:
+            response = self._cached(url)
+            if response is not None:
+                return response
+
+            response = super().__call__(url, method=method, headers=headers, timeout=timeout, **kwargs)
+            if response.status == 200:
+                lifetime = cache_lifetime(response.headers)
+                if lifetime > 0:
+                    self._cache[url] = (time.monotonic() + lifetime, response)
+            return response
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+cert_request = CachingRequest()
+
+
+def verify_google_id_token(token, audience):
+    """
+    Same checks as id_token.verify_oauth2_token, through the cached
+    transport. Raises ValueError for a bad token and GoogleAuthError for
+    a wrong issuer.
+    """
+    idinfo = id_token.verify_token(
+        token,
+        cert_request,
+        audience=audience,
+        certs_url=GOOGLE_CERTS_URL
+    )
+    if idinfo["iss"] not in GOOGLE_ISSUERS:
+        raise google_exceptions.GoogleAuthError(
+            f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}"
+        )
+    return idinfo
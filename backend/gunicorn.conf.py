@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for PointX
+Loaded automatically when gunicorn starts in this directory. Workers
+are threaded, and write Prometheus samples to PROMETHEUS_MULTIPROC_DIR
+so /metrics can report the whole server (see metrics.py).
+"""
+
+import os
+import glob
+import tempfile
+
+# Threaded workers: a sync worker handles one request at a time, so the
+# login bcrypt pool (LOGIN_BCRYPT_WORKERS + LOGIN_BCRYPT_QUEUE checks,
+# see passwords.py) could never fill up and shed logins with 503. Keep
+# threads above that bound. The worker count comes from WEB_CONCURRENCY
+# or --workers as usual.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "pointx-metrics")
+)
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be merged into this one.
+    # The directory may be operator supplied, so only remove sample files.
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    # Queued error and access records would be lost with the writer thread
+    import request_log
+    request_log.handler.flush()
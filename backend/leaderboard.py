@@ -0,0 +1,78 @@
+"""
+PointX leaderboard reads
+Top-K pages and per-visitor rank from the leaderboard_scores table
+(sql/004_leaderboard_scores.sql), falling back to the visitor_leaderboard
+RPC while the table is not deployed.
+"""
+
+import logging
+
+from postgrest.exceptions import APIError
+
+from supabase_client import supabase
+from db import safe_execute
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# PostgREST codes for a missing table / function
+MISSING_RELATION_CODES = {"42P01", "PGRST205", "PGRST202"}
+
+_materialized = True
+
+
+def _missing(e):
+    global _materialized
+    if e.code not in MISSING_RELATION_CODES:
+        return False
+    logger.warning("leaderboard_scores not deployed, using visitor_leaderboard RPC")
+    _materialized = False
+    return True
+
+
+def top(limit=PAGE_SIZE, offset=0):
+    """
+    Return leaderboard rows (rank, user_id, username, total_score,
+    total_plays).
+    Rank is the position in (total_score desc, user_id) order, the same
+    rule leaderboard_rank uses for /leaderboard/me.
+    """
+    if _materialized:
+        try:
+            res = safe_execute(
+                supabase.table("leaderboard_scores")
+                .select("user_id, username, total_score, total_plays:plays")
+                .order("total_score", desc=True)
+                .order("user_id")
+                .range(offset, offset + limit - 1)
+            )
+            return [
+                {**row, "rank": offset + i + 1}
+                for i, row in enumerate(res.data or [])
+            ]
+        except APIError as e:
+            if not _missing(e):
+                raise
+
+    res = safe_execute(supabase.rpc("visitor_leaderboard"))
+    rows = (res.data or [])[offset:offset + limit]
+    return [{**row, "rank": offset + i + 1} for i, row in enumerate(rows)]
+
+
+def rank_of(user_id):
+    """Return {user_id, username, total_score, rank, total_players} or None."""
+    if _materialized:
+        try:
+            res = safe_execute(supabase.rpc("leaderboard_rank", {"p_user_id": user_id}))
+            return res.data or None
+        except APIError as e:
+            if not _missing(e):
+                raise
+
+    rows = safe_execute(supabase.rpc("visitor_leaderboard")).data or []
+    for i, row in enumerate(rows):
+        if row.get("user_id") == user_id:
+            return {**row, "rank": i + 1, "total_players": len(rows)}
+    return None
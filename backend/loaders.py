@@ -0,0 +1,111 @@
+"""
+PointX request-scoped batch loaders
+Collects wallet / stall / user IDs needed while building a response and
+fetches each table with deduplicated, chunked in_() queries. Rows are
+shared by every lookup within the same request.
+"""
+
+import os
+
+from flask import g, has_request_context
+
+from supabase_client import supabase
+from db import safe_execute
+
+# Max IDs per in_() query; 100 UUIDs keep the URL around 4 KB.
+CHUNK_SIZE = int(os.getenv("LOADER_CHUNK_SIZE", "100"))
+
+# Columns fetched per table: a superset of what enrichment code reads.
+LOADER_COLUMNS = {
+    "wallets": "id, username, user_id, balance",
+    "stalls": "id, stall_name, price_per_play, wallet_id",
+    "users": "id, username, role",
+}
+
+
+def chunked(items, size=None):
+    """Yield successive slices of at most `size` items."""
+    size = size or CHUNK_SIZE
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Loader:
+    """
+    Batching loader for one table keyed by `id`.
+
+    prime() queues IDs; load_many() fetches everything queued that is not
+    cached yet in as few queries as possible and returns {id: row}.
+    """
+
+    def __init__(self, table, columns=None, chunk_size=None):
+        self.table = table
+        self.columns = columns or LOADER_COLUMNS.get(table, "*")
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self._rows = {}
+        self._missing = set()
+        self._pending = set()
+
+    def prime(self, ids):
+        """Queue IDs to be fetched by the next load."""
+        for id_ in ids:
+            if id_ and id_ not in self._rows and id_ not in self._missing:
+                self._pending.add(id_)
+        return self
+
+    def put(self, row):
+        """Seed the cache with a row already read elsewhere."""
+        self._rows[row["id"]] = row
+        self._pending.discard(row["id"])
+        self._missing.discard(row["id"])
+
+    def dispatch(self):
+        """Fetch all pending IDs."""
+        pending = sorted(self._pending)
+        self._pending.clear()
+
+        for chunk in chunked(pending, self.chunk_size):
+            res = safe_execute(
+                supabase.table(self.table)
+                .select(self.columns)
+                .in_("id", chunk)
+            )
+            for row in (res.data or []):
+                self._rows[row["id"]] = row
+
+        self._missing.update(id_ for id_ in pending if id_ not in self._rows)
+
+    def load_many(self, ids):
+        """Return {id: row} for the found IDs in `ids`."""
+        ids = [id_ for id_ in ids if id_]
+        self.prime(ids)
+        if self._pending:
+            self.dispatch()
+        return {id_: self._rows[id_] for id_ in ids if id_ in self._rows}
+
+    def load(self, id_):
+        """Return the row for one ID, or None."""
+        return self.load_many([id_]).get(id_)
+
+
+def get_loader(table):
+    """Return the loader for `table` bound to the current request."""
+    if not has_request_context():
+        return Loader(table)
+
+    loaders = g.setdefault("loaders", {})
+    if table not in loaders:
+        loaders[table] = Loader(table)
+    return loaders[table]
+
+
+def wallet_loader():
+    return get_loader("wallets")
+
+
+def stall_loader():
+    return get_loader("stalls")
+
+
+def user_loader():
+    return get_loader("users")
@@ -0,0 +1,131 @@
+"""
+PointX Prometheus metrics
+Request latency per route, PostgREST table/RPC call latency and errors,
+retries from db.safe_execute and in-flight requests, served at /metrics.
+
+Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+(set up by gunicorn.conf.py) and /metrics merges them, so a scrape sees
+the whole server no matter which worker answers it. Without that
+variable, metrics cover the current process only.
+"""
+
+import os
+import hmac
+import time
+
+from flask import g, request, Response
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+http_requests = Counter(
+    "pointx_http_requests_total",
+    "HTTP requests by route and status",
+    ["method", "route", "status"],
+)
+http_latency = Histogram(
+    "pointx_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=HTTP_BUCKETS,
+)
+http_in_flight = Gauge(
+    "pointx_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+
+db_latency = Histogram(
+    "pointx_db_query_duration_seconds",
+    "PostgREST call latency (including retries) by table or RPC",
+    ["kind", "name", "method"],
+    buckets=DB_BUCKETS,
+)
+db_errors = Counter(
+    "pointx_db_query_errors_total",
+    "PostgREST calls that failed after retries, by exception type",
+    ["kind", "name", "method", "error"],
+)
+db_retries = Counter(
+    "pointx_db_retries_total",
+    "PostgREST call retries by table or RPC and cause",
+    ["kind", "name", "method", "error"],
+)
+
+
+def _target(label):
+    """("rpc", "start_game_play") for "rpc/start_game_play", else ("table", label)."""
+    if label.startswith("rpc/"):
+        return "rpc", label[4:]
+    return "table", label
+
+
+# =========================
+# db.safe_execute hooks
+# =========================
+
+def observe_query(method, label, seconds, error=None):
+    kind, name = _target(label)
+    db_latency.labels(kind, name, method).observe(seconds)
+    if error is not None:
+        db_errors.labels(kind, name, method, type(error).__name__).inc()
+
+
+def count_retry(method, label, error):
+    kind, name = _target(label)
+    db_retries.labels(kind, name, method, type(error).__name__).inc()
+
+
+# =========================
+# Request hooks
+# =========================
+
+def start_request():
+    """Count the request as in flight; called from before_request."""
+    http_in_flight.inc()
+    g.metrics_started = time.perf_counter()
+
+
+def observe_request(response):
+    """Record latency and status; called from after_request."""
+    started = g.get("metrics_started")
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    http_latency.labels(request.method, route).observe(time.perf_counter() - started)
+    http_requests.labels(request.method, route, str(response.status_code)).inc()
+
+
+def end_request():
+    """Release the in-flight slot; called from teardown_request."""
+    if g.pop("metrics_started", None) is not None:
+        http_in_flight.dec()
+
+
+# =========================
+# Exposition
+# =========================
+
+def collect():
+    """Text exposition of every worker's metrics (or this process's)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def metrics_view():
+    if METRICS_TOKEN:
+        auth_header = request.headers.get("Authorization", "")
+        supplied = auth_header[len("Bearer "):].strip() if auth_header.startswith("Bearer ") else ""
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(collect(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,168 @@
+"""
+PointX keyset pagination
+Opaque (created_at, id) cursors for list endpoints. Bodies stay plain
+JSON arrays for older clients; cursors travel in response headers:
+
+- X-Next-Cursor:   pass as ?cursor= to get the next (older) page
+- X-Latest-Cursor: pass as ?since= to get only rows newer than this page
+- X-Has-More:      "true" when another page exists in the paging direction
+  (for ?since= requests: call again with the new X-Latest-Cursor)
+"""
+
+import json
+import uuid
+import base64
+from datetime import datetime
+
+from flask import request
+
+
+class CursorError(ValueError):
+    """Raised for malformed cursor, limit or filter parameters (HTTP 400)."""
+
+
+def encode_cursor(row):
+    """Build an opaque cursor from a row's created_at and id."""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """
+    Return (created_at, id) from a cursor.
+    Both parts are re-serialized so they are safe inside PostgREST filters.
+    """
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = datetime.fromisoformat(created_at).isoformat()
+        row_id = str(uuid.UUID(str(row_id)))
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor")
+    return created_at, row_id
+
+
+def parse_timestamp(value, name):
+    """Validate an ISO-8601 query parameter and return it normalized."""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+    except (ValueError, AttributeError):
+        raise CursorError(f"{name} must be an ISO-8601 timestamp")
+
+
+def uuid_arg(name):
+    """Read an optional UUID query parameter."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise CursorError(f"{name} must be a UUID")
+
+
+def apply_time_range(query, column="created_at"):
+    """Filter by ?from= (inclusive) and ?to= (exclusive) ISO timestamps."""
+    start = request.args.get("from")
+    end = request.args.get("to")
+    if start:
+        query = query.gte(column, parse_timestamp(start, "from"))
+    if end:
+        query = query.lt(column, parse_timestamp(end, "to"))
+    return query
+
+
+def page_limit(default, maximum):
+    """Read ?limit= capped to `maximum`."""
+    value = request.args.get("limit")
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise CursorError("limit must be an integer")
+    if limit <= 0:
+        raise CursorError("limit must be positive")
+    return min(limit, maximum)
+
+
+def page_offset(maximum=10000):
+    """Read ?offset= for small offset-paged lists (e.g. leaderboard top-K)."""
+    try:
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        raise CursorError("offset must be an integer")
+    if offset < 0 or offset > maximum:
+        raise CursorError(f"offset must be between 0 and {maximum}")
+    return offset
+
+
+def keyset_condition(cursor, newer=False):
+    """PostgREST logic-tree condition for rows strictly before/after `cursor`."""
+    created_at, row_id = decode_cursor(cursor)
+    op = "gt" if newer else "lt"
+    return (
+        f'or(created_at.{op}."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.{op}.{row_id}))'
+    )
+
+
+def apply_conditions(query, conditions):
+    """AND together PostgREST logic-tree conditions on `query`."""
+    if not conditions:
+        return query
+    # A single-child or() lets us send one AND-ed logic tree
+    return query.or_(f"and({','.join(conditions)})")
+
+
+def paginate(query, limit, extra_conditions=None):
+    """
+    Apply ?cursor= / ?since= keyset paging and ordering to `query`.
+
+    `extra_conditions` are PostgREST logic-tree conditions (e.g.
+    "or(from_wallet.eq.X,to_wallet.eq.X)") AND-ed with the cursor.
+    Returns (query, newer) where `newer` is True for ?since= requests.
+    """
+    cursor = request.args.get("cursor")
+    since = request.args.get("since")
+    if cursor and since:
+        raise CursorError("Use either cursor or since, not both")
+
+    conditions = list(extra_conditions or [])
+    if cursor:
+        conditions.append(keyset_condition(cursor))
+    if since:
+        conditions.append(keyset_condition(since, newer=True))
+
+    query = apply_conditions(query, conditions)
+
+    newer = bool(since)
+    # since= walks forward from the cursor so no rows are skipped
+    query = (
+        query
+        .order("created_at", desc=not newer)
+        .order("id", desc=not newer)
+        .limit(limit + 1)
+    )
+    return query, newer
+
+
+def page_headers(rows, limit, newer=False):
+    """
+    Trim the look-ahead row and build the cursor headers.
+    Returns (rows newest first, headers dict).
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if newer:
+        rows = list(reversed(rows))
+
+    headers = {"X-Has-More": "true" if has_more else "false"}
+    if rows:
+        headers["X-Latest-Cursor"] = encode_cursor(rows[0])
+        if has_more and not newer:
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    elif newer:
+        headers["X-Latest-Cursor"] = request.args.get("since", "")
+
+    return rows, headers
@@ -0,0 +1,90 @@
+"""
+PointX password hashing
+bcrypt is CPU bound; bulk hashing is fanned out over a per-worker
+process pool so a large onboarding upload uses every core instead of
+hashing one password at a time.
+
+Login checks run on a small dedicated thread pool (bcrypt releases the
+GIL) with a cap on waiting checks, so a login rush is shed with 503
+instead of starving every other request in the worker.
+"""
+
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+HASH_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+# Below this many passwords the pool start-up costs more than it saves
+POOL_THRESHOLD = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+VERIFY_WORKERS = int(os.getenv("LOGIN_BCRYPT_WORKERS", "2"))
+# Checks allowed to wait for a verify thread before logins are refused
+VERIFY_QUEUE_LIMIT = int(os.getenv("LOGIN_BCRYPT_QUEUE", "16"))
+VERIFY_TIMEOUT = float(os.getenv("LOGIN_BCRYPT_TIMEOUT", "10"))
+
+_verify_pool = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="bcrypt-verify")
+_verify_slots = threading.BoundedSemaphore(VERIFY_WORKERS + VERIFY_QUEUE_LIMIT)
+
+
+class VerifierBusy(Exception):
+    """Too many password checks in flight; retry later."""
+
+
+def hash_password(password):
+    """Return the bcrypt hash of `password` as a str."""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded gunicorn worker is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def hash_passwords(passwords):
+    """Hash a list of passwords in parallel, preserving order."""
+    passwords = list(passwords)
+    if len(passwords) < POOL_THRESHOLD or HASH_WORKERS <= 1:
+        return [hash_password(p) for p in passwords]
+
+    chunksize = max(1, len(passwords) // (HASH_WORKERS * 4))
+    return list(_get_pool().map(hash_password, passwords, chunksize=chunksize))
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def check_password(password, password_hash):
+    """
+    Verify a password on the login pool. Raises VerifierBusy when the
+    pool and its queue are full or the check does not finish within
+    VERIFY_TIMEOUT.
+    """
+    if not _verify_slots.acquire(blocking=False):
+        raise VerifierBusy()
+
+    try:
+        future = _verify_pool.submit(_checkpw, password, password_hash)
+    except Exception:
+        _verify_slots.release()
+        raise
+    # The slot is held until the hash finishes, even if the caller gives up
+    future.add_done_callback(lambda _: _verify_slots.release())
+
+    try:
+        return future.result(timeout=VERIFY_TIMEOUT)
+    except TimeoutError:
+        raise VerifierBusy()
@@ -0,0 +1,244 @@
+"""
+PointX request logging
+Log records are handed to a bounded in-memory queue and written to
+stdout as JSON lines by a background thread, so a request never waits
+on formatting or the stream. Access logs record method, route, status,
+latency and query count; they are sampled per route, while server
+errors and slow requests are always logged with their query timings.
+Intentional 503s carrying Retry-After are sampled too.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+
+from flask import g, request
+
+import db
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Fraction of ordinary requests that get an access log line
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))
+# Responses at or above this status are always logged
+ALWAYS_LOG_STATUS = 500
+
+# Built-in rates; LOG_SAMPLE_RATES entries override or extend them
+DEFAULT_SAMPLE_RATES = {
+    "OPTIONS": 0.0,
+    "/api/health": 0.0,
+}
+
+access_logger = logging.getLogger("pointx.access")
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def parse_sample_rates(spec):
+    """
+    Parse LOG_SAMPLE_RATES: comma separated key=rate pairs where key is
+    a route rule, a method, or "METHOD rule", e.g.
+    "GET /api/stall/history=0.01,/api/visitor/wallet=0.05".
+    """
+    rates = {}
+    for item in (spec or "").split(","):
+        key, sep, rate = item.rpartition("=")
+        if not sep or not key.strip():
+            continue
+        try:
+            rates[key.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+SAMPLE_RATES = {**DEFAULT_SAMPLE_RATES, **parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))}
+
+
+def sample_rate(method, route):
+    """Most specific configured rate for a request."""
+    for key in (f"{method} {route}", route, method):
+        rate = SAMPLE_RATES.get(key)
+        if rate is not None:
+            return rate
+    return LOG_SAMPLE_RATE
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra= fields become top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    Non-blocking handler: emit() only enqueues, a writer thread formats
+    and writes. When the queue is full the record is dropped and counted
+    rather than stalling the request.
+    """
+
+    def __init__(self, stream=None, maxsize=LOG_QUEUE_SIZE):
+        super().__init__()
+        self.stream = stream or sys.stdout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        # Serializes writes from the writer thread and flush()
+        self._write_lock = threading.Lock()
+        self._thread = None
+
+    def emit(self, record):
+        # Tracebacks hold frames; render them while they are still valid
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _ensure_writer(self):
+        # Threads do not survive a fork, so check on every emit
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            # Drain whatever else is waiting into a single write
+            while len(records) < 256:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(records)
+
+    def _write(self, records):
+        try:
+            with self._write_lock:
+                self.stream.write("".join(self.format(r) + "\n" for r in records))
+                self.stream.flush()
+        except Exception:
+            pass
+        finally:
+            for _ in records:
+                self._queue.task_done()
+
+    def flush(self, timeout=2.0):
+        """
+        Write everything still queued from the calling thread and wait
+        (up to `timeout`) for the writer's in-flight batch. Called at
+        process exit and from gunicorn's worker_exit hook.
+        """
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if records:
+            self._write(records)
+
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+handler = QueueLogHandler()
+handler.setFormatter(JsonFormatter())
+# Daemon writer threads die with the process; write what is left first
+atexit.register(handler.flush)
+
+
+def setup_logging(app):
+    """Route the app, access and module loggers through the queue handler."""
+    root = logging.getLogger()
+    if handler not in root.handlers:
+        root.addHandler(handler)
+
+    # Flask's default stderr handler would write every record a second time
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(LOG_LEVEL)
+    access_logger.setLevel(logging.INFO)
+
+
+def start_request():
+    """Start the latency clock; called from before_request."""
+    g.request_started = time.perf_counter()
+
+
+def log_request(response):
+    """Write the access log line for this request if it is sampled."""
+    started = g.get("request_started")
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    status = response.status_code
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+
+    # Load shedding (503 + Retry-After from the login, stream and upload
+    # limits) is sampled like ordinary traffic: a storm of them should not
+    # write the most logs exactly when the server is trying to do less
+    shed = status == 503 and "Retry-After" in response.headers
+    slow = elapsed_ms >= SLOW_REQUEST_MS and not shed
+    failed = status >= ALWAYS_LOG_STATUS and not shed
+    if not (slow or failed):
+        rate = sample_rate(request.method, route)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return
+
+    queries = db.query_stats()
+    fields = {
+        "method": request.method,
+        "route": route,
+        "status": status,
+        "ms": round(elapsed_ms, 1),
+        "queries": len(queries),
+        "db_ms": round(sum(q["ms"] for q in queries), 1),
+    }
+    if slow or failed:
+        fields["path"] = request.path
+        fields["query_log"] = queries
+        if failed:
+            access_logger.error("REQUEST FAILED", extra=fields)
+        else:
+            access_logger.warning("SLOW REQUEST", extra=fields)
+    elif shed:
+        fields["sample_rate"] = rate
+        access_logger.warning("REQUEST SHED", extra=fields)
+    else:
+        fields["sample_rate"] = rate
+        access_logger.info("REQUEST", extra=fields)
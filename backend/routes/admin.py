@@ -12,39 +12,36 @@ Admin routes:
 - leaderboards
 """
 
-from flask import  request, jsonify
+from flask import  request, jsonify, Response, stream_with_context
 from flask_smorest import Blueprint
 
+import os
 import bcrypt
 
 from supabase_client import supabase
+from db import safe_execute
+from loaders import wallet_loader, stall_loader, user_loader, chunked
+from cache import (
+    invalidate_stall, invalidate_sessions, invalidate_stall_version,
+    get_signed_url, get_signed_urls
+)
+from passwords import hash_passwords
+from topups import thumbnail_path
+from pagination import (
+    paginate, page_headers, page_limit, uuid_arg, apply_time_range,
+    apply_conditions, keyset_condition, encode_cursor, page_offset
+)
+from conditional import conditional_json, etag_for, is_fresh, not_modified, row_version
+import leaderboard as leaderboard_store
 from auth import require_auth, generate_token
 from marshmallow import Schema, fields
-import httpx
-import time
 
 from postgrest.exceptions import APIError
 
-def safe_execute(query, retries=3, delay=1):
-    for attempt in range(retries):
-        try:
-            return query.execute()
-
-        except (httpx.RemoteProtocolError, httpx.ConnectError) as e:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2 
-            
-        except httpx.TimeoutException:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2
-
-        except APIError:
-            raise
-
+import io
+import csv
+import json
+from datetime import datetime, timezone
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -89,6 +86,10 @@ class TopupApproveSchema(Schema):
     request_id = fields.UUID(required=True)
 
 
+class TopupBatchApproveSchema(Schema):
+    request_ids = fields.List(fields.UUID(), required=True)
+
+
 @admin_bp.route("/create-user", methods=["POST"])
 @require_auth(["admin"])
 def create_user():
@@ -160,6 +161,9 @@ def create_stall():
             "user_id": None  # No user tied to stall
         })
     ).data[0]
+
+    # Drop any stale cached copy in this worker
+    invalidate_stall(stall["id"])
     
     return jsonify({
         "stall_id": stall["id"],
@@ -170,6 +174,46 @@ def create_stall():
 
 
 
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_QUERY_TIMEOUT = 30
+
+# Operators and legacy stalls start with 0
+INITIAL_BALANCES = {"visitor": 60, "admin": 10000}
+
+
+def bulk_insert(table, rows, key):
+    """
+    Insert rows with one multi-row request, skipping rows whose `key`
+    already exists (ON CONFLICT DO NOTHING). Returns the inserted rows
+    aligned with `rows`, None where a row was a duplicate.
+    """
+    try:
+        inserted = safe_execute(
+            supabase.table(table).upsert(rows, on_conflict=key, ignore_duplicates=True),
+            timeout=BULK_QUERY_TIMEOUT
+        ).data or []
+    except APIError as e:
+        if e.code != "23505":
+            raise
+        # A different unique constraint; only then fall back to one row at a time
+        return [_insert_one(table, row) for row in rows]
+
+    by_key = {row[key]: row for row in inserted}
+    return [by_key.get(row[key]) for row in rows]
+
+
+def _insert_one(table, row):
+    try:
+        return safe_execute(
+            supabase.table(table).insert(row),
+            timeout=BULK_QUERY_TIMEOUT
+        ).data[0]
+    except APIError as e:
+        if e.code != "23505":
+            raise
+        return None
+
+
 @admin_bp.route("/bulk-users", methods=["POST"])
 @require_auth(["admin"])
 @admin_bp.arguments(BulkUsersSchema)
@@ -183,129 +227,142 @@ def bulk_users(data):
     """
 
     inp = data.get("users", [])
-    users=[]
     operator_assignments = []  # Track operator->stall assignments
     
     if not inp:
         return jsonify({"error" : "Empty Bulk-Users" }),400
-    
-    # First pass: Create all users
-    for data in inp:
-        hashed = bcrypt.hashpw(
-            data["password"].encode(),
-            bcrypt.gensalt()
-        ).decode()
 
-        try:
-            user = safe_execute(
-                supabase.table("users").insert({
-                    "username": data["username"],
-                    "reg_no": data["username"],
-                    "password_hash": hashed,
-                    "passwd": data["password"],
-                    "role": data.get("role", "visitor")
-                })
-            ).data[0]
-
-        except APIError as e:
-            if "duplicate key value" in str(e):
-                users.append({
-                    "username": data["username"],
-                    "status": "duplicate_skipped"
-                })
-                continue
-            else:
-                raise
+    # Results stay in upload order; duplicates are decided per row up front
+    users = [None] * len(inp)
+    existing = set()
+    for names in chunked(list({entry["username"] for entry in inp}), BULK_CHUNK_SIZE):
+        res = safe_execute(
+            supabase.table("users").select("username").in_("username", names),
+            timeout=BULK_QUERY_TIMEOUT
+        )
+        existing.update(row["username"] for row in (res.data or []))
 
-        # Determine initial balance based on role
-        if user["role"] == "visitor":
-            balance = 60
-        elif user["role"] == "admin":
-            balance = 10000
+    pending = []
+    for i, entry in enumerate(inp):
+        if entry["username"] in existing:
+            users[i] = {"username": entry["username"], "status": "duplicate_skipped"}
         else:
-            balance = 0  # operators and legacy stalls start with 0
+            existing.add(entry["username"])
+            pending.append(i)
+
+    # First pass: hash in parallel, then create users and wallets in batches
+    hashes = hash_passwords(inp[i]["password"] for i in pending)
+
+    for batch in chunked(list(zip(pending, hashes)), BULK_CHUNK_SIZE):
+        created = bulk_insert("users", [
+            {
+                "username": inp[i]["username"],
+                "reg_no": inp[i]["username"],
+                "password_hash": hashed,
+                "passwd": inp[i]["password"],
+                "role": inp[i].get("role", "visitor")
+            }
+            for i, hashed in batch
+        ], key="username")
+
+        new_users = []
+        for (i, _), user in zip(batch, created):
+            if user is None:
+                # Lost a race with a concurrent insert
+                users[i] = {"username": inp[i]["username"], "status": "duplicate_skipped"}
+            else:
+                new_users.append((i, user))
+
+        if not new_users:
+            continue
 
-        wallet = safe_execute(
-            supabase.table("wallets").insert({
+        wallets = safe_execute(
+            supabase.table("wallets").insert([
+                {
+                    "user_id": user["id"],
+                    "username": inp[i].get("name", inp[i]["username"]),
+                    "balance": INITIAL_BALANCES.get(user["role"], 0)
+                }
+                for i, user in new_users
+            ]),
+            timeout=BULK_QUERY_TIMEOUT
+        ).data
+        wallet_ids = {w["user_id"]: w["id"] for w in wallets}
+
+        for i, user in new_users:
+            users[i] = {
                 "user_id": user["id"],
-                "username": data.get("name", data["username"]),
-                "balance": balance
+                "user_name": user["username"],
+                "wallet_id": wallet_ids.get(user["id"]),
+                "user_password": user["passwd"],
+                "role": user["role"]
+            }
+
+    # Handle operator assignment to existing stall
+    for i, entry in enumerate(inp):
+        result = users[i]
+        if result.get("role") == "operator" and entry.get("stall_name"):
+            operator_assignments.append({
+                "user_id": result["user_id"],
+                "username": result["user_name"],
+                "stall_name": entry["stall_name"]
             })
-        ).data[0]
-        
-        user_result = {
-            "user_id": user["id"],
-            "user_name": user["username"],
-            "wallet_id": wallet["id"],
-            "user_password": user["passwd"],
-            "role": user["role"]
-        }
-        
-        # Handle operator assignment to existing stall
-        if user["role"] == "operator":
-            stall_name = data.get("stall_name")
-            if stall_name:
-                operator_assignments.append({
-                    "user_id": user["id"],
-                    "username": user["username"],
-                    "stall_name": stall_name
-                })
-        
-        users.append(user_result)
     
-    # Second pass: Assign operators to stalls
+    # Second pass: Assign operators to stalls as set operations
     assignment_results = []
-    
-    # Handle operator -> stall assignments (operator has stall_name)
-    for assignment in operator_assignments:
-        try:
-            # Find stall by name
-            stall_res = safe_execute(
+
+    if operator_assignments:
+        stall_ids = {}
+        for names in chunked(list({a["stall_name"] for a in operator_assignments}), BULK_CHUNK_SIZE):
+            res = safe_execute(
                 supabase.table("stalls")
-                .select("id")
-                .eq("stall_name", assignment["stall_name"])
-                .single()
+                .select("id, stall_name")
+                .in_("stall_name", names),
+                timeout=BULK_QUERY_TIMEOUT
             )
-            
-            if stall_res.data:
-                # Check if operator is already assigned
-                existing = safe_execute(
-                    supabase.table("stall_operators")
-                    .select("id")
-                    .eq("user_id", assignment["user_id"])
-                )
-                
-                if not existing.data or len(existing.data) == 0:
-                    # Assign operator
-                    safe_execute(
-                        supabase.table("stall_operators").insert({
-                            "stall_id": stall_res.data["id"],
-                            "user_id": assignment["user_id"]
-                        })
-                    )
-                    assignment_results.append({
-                        "operator": assignment["username"],
-                        "stall": assignment["stall_name"],
-                        "status": "assigned"
-                    })
-                else:
-                    assignment_results.append({
-                        "operator": assignment["username"],
-                        "stall": assignment["stall_name"],
-                        "status": "already_assigned"
-                    })
-            else:
-                assignment_results.append({
-                    "operator": assignment["username"],
-                    "stall": assignment["stall_name"],
-                    "status": "stall_not_found"
-                })
-        except Exception as e:
-            assignment_results.append({
+            for stall in (res.data or []):
+                stall_ids.setdefault(stall["stall_name"], stall["id"])
+
+        assigned = set()
+        for ids in chunked([a["user_id"] for a in operator_assignments], BULK_CHUNK_SIZE):
+            res = safe_execute(
+                supabase.table("stall_operators")
+                .select("user_id")
+                .in_("user_id", ids),
+                timeout=BULK_QUERY_TIMEOUT
+            )
+            assigned.update(row["user_id"] for row in (res.data or []))
+
+        new_assignments = []
+        for assignment in operator_assignments:
+            result = {
                 "operator": assignment["username"],
                 "stall": assignment["stall_name"],
-                "status": f"error: {str(e)}"
-            })
+                "status": "assigned"
+            }
+            if assignment["stall_name"] not in stall_ids:
+                result["status"] = "stall_not_found"
+            elif assignment["user_id"] in assigned:
+                result["status"] = "already_assigned"
+            else:
+                new_assignments.append((assignment, result))
+            assignment_results.append(result)
+
+        for batch in chunked(new_assignments, BULK_CHUNK_SIZE):
+            try:
+                safe_execute(
+                    supabase.table("stall_operators").insert([
+                        {
+                            "stall_id": stall_ids[assignment["stall_name"]],
+                            "user_id": assignment["user_id"]
+                        }
+                        for assignment, _ in batch
+                    ]),
+                    timeout=BULK_QUERY_TIMEOUT
+                )
+            except Exception as e:
+                for _, result in batch:
+                    result["status"] = f"error: {str(e)}"
     
     response = {
         "users": users,
@@ -318,14 +375,20 @@ def bulk_users(data):
 @require_auth(["admin"])
 def user_view():
     """
-    Docstring for user_view
+    List users, newest first, keyset paginated.
+    Query params: limit, cursor / since, role, from, to
     """
-    res=supabase.table("users")\
-        .select("*")\
-        .limit(1000)\
-        .execute()
+    limit = page_limit(1000, 1000)
+
+    query = supabase.table("users").select("*")
+    if request.args.get("role"):
+        query = query.eq("role", request.args["role"])
+    query, newer = paginate(apply_time_range(query), limit)
+
+    res = safe_execute(query)
+    rows, headers = page_headers(res.data or [], limit, newer)
     
-    return jsonify(res.data)
+    return jsonify(rows), 200, headers
 
 
 @admin_bp.route("/topup", methods=["POST"])
@@ -386,31 +449,25 @@ def admin_topup(data):
 @require_auth(["admin"])
 def plays_view():
     """
-    Get all play transactions with visitor information
+    Get play transactions with visitor information, newest first.
+    Query params: limit, cursor / since, stall_id, wallet, from, to
     """
-    res = safe_execute(supabase.table("transactions") \
-        .select("*") \
-        .eq("type", "play") \
-        .order("created_at", desc=True) \
-        .limit(500))
+    limit = page_limit(500, 500)
+
+    query, conditions = transaction_filters(
+        supabase.table("transactions")
+        .select("*")
+        .eq("type", "play")
+    )
+    query, newer = paginate(query, limit, conditions)
 
-    plays = res.data
+    res = safe_execute(query)
+    plays, headers = page_headers(res.data or [], limit, newer)
     
-    # Collect all unique wallet IDs
-    wallet_ids = set()
-    for play in plays:
-        if play.get("from_wallet"):
-            wallet_ids.add(play["from_wallet"])
-        if play.get("to_wallet"):
-            wallet_ids.add(play["to_wallet"])
-    
-    # Bulk fetch all wallets in one query
-    wallet_map = {}
-    if wallet_ids:
-        wallets_res = safe_execute(supabase.table("wallets") \
-            .select("id, username, user_id") \
-            .in_("id", list(wallet_ids)))
-        wallet_map = {w["id"]: w for w in wallets_res.data}
+    # Bulk fetch visitor and stall wallets
+    wallet_map = wallet_loader().load_many(
+        [play.get("from_wallet") for play in plays] + [play.get("to_wallet") for play in plays]
+    )
     
     # Enrich transactions with visitor usernames
     enriched_plays = []
@@ -428,7 +485,28 @@ def plays_view():
          
         enriched_plays.append(enriched_play)
 
-    return jsonify(enriched_plays), 200
+    return jsonify(enriched_plays), 200, headers
+
+
+def transaction_filters(query):
+    """
+    Apply the shared transaction list filters from the query string.
+    Returns (query, logic-tree conditions) for paginate().
+    """
+    conditions = []
+
+    stall_id = uuid_arg("stall_id")
+    if stall_id:
+        query = query.eq("stall_id", stall_id)
+
+    if request.args.get("type"):
+        query = query.eq("type", request.args["type"])
+
+    wallet_id = uuid_arg("wallet")
+    if wallet_id:
+        conditions.append(f"or(from_wallet.eq.{wallet_id},to_wallet.eq.{wallet_id})")
+
+    return apply_time_range(query), conditions
 
 
 @admin_bp.route("/attendance", methods=["POST"])
@@ -480,6 +558,12 @@ def freeze_wallet(wallet_id):
 @admin_bp.route("/topup-requests", methods=["GET"])
 @require_auth(["admin"])
 def pending_topups():
+    # Any new, approved or rejected request bumps the newest row_version
+    version = row_version(supabase.table("topup_requests").select("row_version"))
+    tag = etag_for("topup-requests", version) if version else None
+    if is_fresh(tag):
+        return not_modified(tag)
+
     res = safe_execute(supabase.table("topup_requests") \
         .select("id, user_id, wallet_id, amount, image_path, created_at, wallets(username)") \
         .eq("status", "pending") \
@@ -494,40 +578,59 @@ def pending_topups():
             "wallet_id": item["wallet_id"],
             "amount": item["amount"],
             "image_path": item["image_path"],
+            "thumbnail_path": thumbnail_path(item["image_path"]),
             "created_at": item["created_at"],
             "username": item["wallets"]["username"] if item.get("wallets") else "Unknown"
         }
         formatted_data.append(formatted_item)
 
-    return jsonify(formatted_data)
+    return conditional_json(formatted_data, tag=tag)
 
 from urllib.parse import unquote
 
+SIGN_MAX_PATHS = 500
+
 @admin_bp.route("/topup-image/<path:image_path>", methods=["GET"])
 @require_auth(["admin"])
 def get_topup_image(image_path):
     try:
         image_path = unquote(image_path)
 
-        signed = supabase.storage.from_("payments").create_signed_url(
-            image_path,
-            expires_in=3600
-        )
+        signed = get_signed_url(image_path)
 
-        # Supabase Python client returns dict
-        signed_url = signed.get("signedURL") or signed.get("signedUrl")
+        if not signed:
+            return jsonify({"error": f"Signed URL failed for {image_path}"}), 500
 
-        if not signed_url:
-            return jsonify({"error": f"Signed URL failed: {signed}"}), 500
+        return jsonify(signed), 200
 
-        return jsonify({
-            "url": signed_url,
-            "expires_in": 3600
-        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/topup-images", methods=["POST"])
+@require_auth(["admin"])
+def sign_topup_images():
+    """
+    Sign many proof images in one call, e.g. every image_path on the
+    current topup-requests page.
+    Body: {"paths": [...]} (max SIGN_MAX_PATHS)
+    Returns {"urls": {path: {"url", "expires_in"}}, "failed": [path, ...]}
+    """
+    paths = (request.get_json(silent=True) or {}).get("paths")
+    if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+        return jsonify({"error": "paths must be a list of strings"}), 400
+    if len(paths) > SIGN_MAX_PATHS:
+        return jsonify({"error": f"At most {SIGN_MAX_PATHS} paths per call"}), 400
 
+    try:
+        urls = get_signed_urls(paths)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    return jsonify({
+        "urls": urls,
+        "failed": [p for p in dict.fromkeys(paths) if p not in urls]
+    }), 200
+
 @admin_bp.route("/storage-debug", methods=["GET"])
 @require_auth(["admin"])
 def debug_storage():
@@ -655,32 +758,127 @@ def approve_topup(data):
 
     return jsonify(result.data), 200
 
+APPROVE_BATCH_MAX = 500
+APPROVE_BATCH_TIMEOUT = 30
+# Requests per approve_topup_requests call. row_version is taken at write
+# time (sql/005), so each call's transaction must stay short or pollers can
+# cache an ETag over rows that commit later.
+APPROVE_CHUNK_SIZE = 50
+
+@admin_bp.route("/topup-approve-batch", methods=["POST"])
+@require_auth(["admin"])
+@admin_bp.arguments(TopupBatchApproveSchema)
+@admin_bp.response(200)
+def approve_topups_batch(data):
+    """
+    Approve many pending top-up requests, APPROVE_CHUNK_SIZE per
+    transaction (approve_topup_requests, sql/006). One outcome per
+    distinct id: approved, not_found, skipped (no longer pending) or error.
+    """
+    request_ids = list(dict.fromkeys(str(r) for r in data["request_ids"]))
+    if not request_ids:
+        return jsonify({"error": "request_ids is required"}), 400
+    if len(request_ids) > APPROVE_BATCH_MAX:
+        return jsonify({"error": f"At most {APPROVE_BATCH_MAX} requests per batch"}), 400
+
+    results = []
+    batched = True
+    for chunk in chunked(request_ids, APPROVE_CHUNK_SIZE):
+        if batched:
+            try:
+                results.extend(safe_execute(supabase.rpc("approve_topup_requests", {
+                    "p_request_ids": chunk,
+                    "p_admin_id": request.user["id"]
+                }), timeout=APPROVE_BATCH_TIMEOUT).data or [])
+                continue
+            except APIError as e:
+                if e.code != "PGRST202":
+                    # Earlier chunks are committed; report this one as failed
+                    results.extend(
+                        {"request_id": r, "status": "error", "error": e.message}
+                        for r in chunk
+                    )
+                    continue
+                # sql/006 not applied yet: approve one by one
+                batched = False
+
+        for request_id in chunk:
+            try:
+                safe_execute(supabase.rpc("approve_topup_request", {
+                    "p_request_id": request_id,
+                    "p_admin_id": request.user["id"]
+                }), timeout=APPROVE_BATCH_TIMEOUT)
+                results.append({"request_id": request_id, "status": "approved"})
+            except APIError as err:
+                results.append({"request_id": request_id, "status": "error", "error": err.message})
+
+    approved = sum(1 for r in results if r.get("status") == "approved")
+    return jsonify({
+        "results": results,
+        "approved": approved,
+        "failed": len(results) - approved
+    }), 200
+
 @admin_bp.route("/wallets", methods=["GET"])
 @require_auth(["admin"])
 def wallets():
-    res = safe_execute(supabase.table("wallets") \
-        .select("id, user_id, username, balance, is_active, created_at") \
-        .limit(1000))
-    return jsonify(res.data)
+    """
+    List wallets, newest first, keyset paginated.
+    Query params: limit, cursor / since, active (true/false), from, to
+    """
+    limit = page_limit(1000, 1000)
+
+    version = row_version(supabase.table("wallets").select("row_version"))
+    tag = etag_for("wallets", request.full_path, version) if version else None
+    if is_fresh(tag):
+        return not_modified(tag)
+
+    query = supabase.table("wallets") \
+        .select("id, user_id, username, balance, is_active, created_at")
+    if request.args.get("active") in ("true", "false"):
+        query = query.eq("is_active", request.args["active"] == "true")
+    query, newer = paginate(apply_time_range(query), limit)
+
+    res = safe_execute(query)
+    rows, headers = page_headers(res.data or [], limit, newer)
+    return conditional_json(rows, headers=headers, tag=tag)
 
 
 @admin_bp.route("/leaderboard", methods=["GET"])
 @require_auth(["visitor", "admin"])
 def leaderboard():
-    res = safe_execute(supabase.rpc("visitor_leaderboard"))
-    return jsonify(res.data), 200
+    """
+    Leaderboard top-K.
+    Query params: limit (default 50, max 200), offset
+    """
+    limit = page_limit(leaderboard_store.PAGE_SIZE, leaderboard_store.MAX_PAGE_SIZE)
+    return jsonify(leaderboard_store.top(limit, page_offset())), 200
 
 @admin_bp.route("/transactions", methods=["GET"])
 @require_auth(["admin"])
 def transactions():
-    """Get all transactions with topup image info where available"""
-    res = safe_execute(supabase.table("transactions") \
-        .select("*") \
-        .order("created_at", desc=True) \
-        .limit(500))
+    """
+    Get transactions with topup image info where available, newest first.
+    Query params: limit, cursor / since, stall_id, type, wallet, from, to
+    """
+    limit = page_limit(500, 500)
+
+    query, conditions = transaction_filters(supabase.table("transactions").select("*"))
+    query, newer = paginate(query, limit, conditions)
+
+    res = safe_execute(query)
+    transactions_data, headers = page_headers(res.data or [], limit, newer)
     
-    transactions_data = res.data
+    enhanced_transactions = enrich_topups(transactions_data)
     
+    return jsonify(enhanced_transactions), 200, headers
+
+
+def enrich_topups(transactions_data, timeout=None):
+    """
+    Attach topup proof image info (has_topup_image, topup_image_path,
+    topup_image_hash) to topup transactions.
+    """
     # Collect all wallet IDs for topup transactions
     topup_wallet_ids = set()
     for transaction in transactions_data:
@@ -689,13 +887,14 @@ def transactions():
     
     # Bulk fetch topup requests for all topup transactions
     topup_map = {}
-    if topup_wallet_ids:
+    for wallet_ids in chunked(sorted(topup_wallet_ids)):
         topup_res = safe_execute(
             supabase.table("topup_requests")
             .select("wallet_id, amount, image_path, image_hash, created_at")
-            .in_("wallet_id", list(topup_wallet_ids))
+            .in_("wallet_id", wallet_ids)
             .eq("status", "approved")
-            .order("created_at", desc=True)
+            .order("created_at", desc=True),
+            timeout=timeout
         )
         
         # Create map: wallet_id -> list of topup requests
@@ -732,7 +931,95 @@ def transactions():
         
         enhanced_transactions.append(enhanced_transaction)
     
-    return jsonify(enhanced_transactions)
+    return enhanced_transactions
+
+
+# -------- Streaming export --------
+
+EXPORT_PAGE_SIZE = 1000
+EXPORT_PAGE_TIMEOUT = 30  # seconds per page, exports outlive the request deadline
+EXPORT_TOPUP_FIELDS = ["has_topup_image", "topup_image_path", "topup_image_hash"]
+
+
+@admin_bp.route("/export/transactions", methods=["GET"])
+@require_auth(["admin"])
+def export_transactions():
+    """
+    Stream every transaction, oldest first, as NDJSON (default) or CSV.
+    Query params: format (ndjson/csv), stall_id, type, wallet, from, to
+    """
+    return stream_export("transactions", play_only=False)
+
+
+@admin_bp.route("/export/plays", methods=["GET"])
+@require_auth(["admin"])
+def export_plays():
+    """
+    Stream every play transaction, oldest first, as NDJSON or CSV.
+    Query params: format (ndjson/csv), stall_id, wallet, from, to
+    """
+    return stream_export("plays", play_only=True)
+
+
+def stream_export(name, play_only):
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    # Validate filters up front so bad params fail before streaming starts
+    transaction_filters(supabase.table("transactions").select("*"))
+
+    def pages():
+        cursor = None
+        while True:
+            query, conditions = transaction_filters(supabase.table("transactions").select("*"))
+            if play_only:
+                query = query.eq("type", "play")
+            if cursor:
+                conditions.append(keyset_condition(cursor, newer=True))
+
+            res = safe_execute(
+                apply_conditions(query, conditions)
+                .order("created_at")
+                .order("id")
+                .limit(EXPORT_PAGE_SIZE),
+                timeout=EXPORT_PAGE_TIMEOUT
+            )
+            rows = res.data or []
+            if not rows:
+                return
+
+            yield enrich_topups(rows, timeout=EXPORT_PAGE_TIMEOUT)
+
+            if len(rows) < EXPORT_PAGE_SIZE:
+                return
+            cursor = encode_cursor(rows[-1])
+
+    def ndjson():
+        for page in pages():
+            yield "".join(json.dumps(row, default=str) + "\n" for row in page)
+
+    def csv_rows():
+        fieldnames = None
+        for page in pages():
+            buffer = io.StringIO()
+            if fieldnames is None:
+                fieldnames = [k for k in page[0] if k not in EXPORT_TOPUP_FIELDS] + EXPORT_TOPUP_FIELDS
+                writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+                writer.writeheader()
+            else:
+                writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writerows(page)
+            yield buffer.getvalue()
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    body, mimetype = (csv_rows(), "text/csv") if fmt == "csv" else (ndjson(), "application/x-ndjson")
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={name}-{stamp}.{fmt}"}
+    )
 
 @admin_bp.route("/assign-operator", methods=["POST"])
 @require_auth(["admin"])
@@ -773,6 +1060,7 @@ def assign_operator():
             "user_id": user_id
         })
     )
+    invalidate_stall_version(user_id)
 
     return jsonify({"success": True})
 
@@ -800,6 +1088,7 @@ def remove_operator():
             .eq("user_id", user_id)
             .eq("is_active", True)
         )
+        invalidate_sessions(user_id)
         
         # Then remove the operator assignment
         result = safe_execute(
@@ -808,6 +1097,7 @@ def remove_operator():
             .eq("stall_id", stall_id)
             .eq("user_id", user_id)
         )
+        invalidate_stall_version(user_id)
         
         # Check if anything was deleted
         if result.data is None or (isinstance(result.data, list) and len(result.data) == 0):
@@ -862,6 +1152,7 @@ def activate_operator():
             "is_active": True
         })
     )
+    invalidate_sessions(user_id)
     
     return jsonify({"success": True, "message": "Operator activated"})
 
@@ -887,6 +1178,7 @@ def deactivate_operator():
         .eq("user_id", user_id)
         .eq("is_active", True)
     )
+    invalidate_sessions(user_id)
     
     if not result.data or len(result.data) == 0:
         return jsonify({"error": "No active session found"}), 404
@@ -927,29 +1219,10 @@ def get_stalls():
         active_by_stall[stall_id].append(s["user_id"])
     
     # Get user info for all operators
-    user_ids = set()
-    for op in (operators_res.data or []):
-        user_ids.add(op["user_id"])
-    
-    users_map = {}
-    if user_ids:
-        users_res = safe_execute(
-            supabase.table("users")
-            .select("id, username, role")
-            .in_("id", list(user_ids))
-        )
-        users_map = {u["id"]: u for u in (users_res.data or [])}
+    users_map = user_loader().load_many(op["user_id"] for op in (operators_res.data or []))
     
     # Get wallet balances
-    wallet_ids = [s["wallet_id"] for s in stalls if s.get("wallet_id")]
-    wallets_map = {}
-    if wallet_ids:
-        wallets_res = safe_execute(
-            supabase.table("wallets")
-            .select("id, balance")
-            .in_("id", wallet_ids)
-        )
-        wallets_map = {w["id"]: w for w in (wallets_res.data or [])}
+    wallets_map = wallet_loader().load_many(s.get("wallet_id") for s in stalls)
     
     # Build operator map by stall
     operators_by_stall = {}
@@ -1018,17 +1291,20 @@ def search_operators():
         # Get stall assignments
         assignments_res = safe_execute(
             supabase.table("stall_operators")
-            .select("user_id, stall_id, stalls(stall_name)")
+            .select("user_id, stall_id")
             .in_("user_id", operator_ids)
         )
+        assignments = assignments_res.data or []
+        stall_map = stall_loader().load_many(a["stall_id"] for a in assignments)
         
-        for assignment in (assignments_res.data or []):
+        for assignment in assignments:
             user_id = assignment["user_id"]
             if user_id not in assignments_map:
                 assignments_map[user_id] = []
+            stall = stall_map.get(assignment["stall_id"])
             assignments_map[user_id].append({
                 "stall_id": assignment["stall_id"],
-                "stall_name": assignment["stalls"]["stall_name"] if assignment.get("stalls") else "Unknown"
+                "stall_name": stall["stall_name"] if stall else "Unknown"
             })
         
         # Get active sessions
@@ -1088,37 +1364,44 @@ def search_stalls():
     active_operators_map = {}
     
     if stall_ids:
-        # Get assigned operators
+        # Get assigned and active operators
         operators_res = safe_execute(
             supabase.table("stall_operators")
-            .select("stall_id, user_id, users(username)")
+            .select("stall_id, user_id")
             .in_("stall_id", stall_ids)
         )
+        sessions_res = safe_execute(
+            supabase.table("stall_sessions")
+            .select("stall_id, user_id")
+            .in_("stall_id", stall_ids)
+            .eq("is_active", True)
+        )
+        operator_rows = operators_res.data or []
+        session_rows = sessions_res.data or []
+
+        # One users query shared by both lists
+        users_map = user_loader().load_many(
+            [op["user_id"] for op in operator_rows] + [s["user_id"] for s in session_rows]
+        )
         
-        for op in (operators_res.data or []):
+        for op in operator_rows:
             stall_id = op["stall_id"]
             if stall_id not in operators_map:
                 operators_map[stall_id] = []
+            user = users_map.get(op["user_id"])
             operators_map[stall_id].append({
                 "user_id": op["user_id"],
-                "username": op["users"]["username"] if op.get("users") else "Unknown"
+                "username": user["username"] if user else "Unknown"
             })
         
-        # Get active operators
-        sessions_res = safe_execute(
-            supabase.table("stall_sessions")
-            .select("stall_id, user_id, users(username)")
-            .in_("stall_id", stall_ids)
-            .eq("is_active", True)
-        )
-        
-        for session in (sessions_res.data or []):
+        for session in session_rows:
             stall_id = session["stall_id"]
             if stall_id not in active_operators_map:
                 active_operators_map[stall_id] = []
+            user = users_map.get(session["user_id"])
             active_operators_map[stall_id].append({
                 "user_id": session["user_id"],
-                "username": session["users"]["username"] if session.get("users") else "Unknown"
+                "username": user["username"] if user else "Unknown"
             })
     
     # Enrich stalls with operator info
@@ -9,18 +9,21 @@ Auth routes:
 from flask import request, jsonify, current_app
 from flask_smorest import Blueprint
 from marshmallow import Schema, fields
-import bcrypt
 import os
-import time
 import httpx
-from postgrest.exceptions import APIError
 
 from supabase_client import supabase
-from auth import require_auth, generate_token
+from db import safe_execute
+from passwords import check_password, VerifierBusy
+from auth import (
+    require_auth, generate_token, token_context, revoke_token, bearer_token,
+    issue_refresh_token, redeem_refresh_token, revoke_refresh_token, RefreshTokenError
+)
 
 import re
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from google_certs import verify_google_id_token
+
+LOGIN_RETRY_AFTER_SECONDS = 2
 
 # Google OAuth Configuration
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
@@ -29,26 +32,6 @@ GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 # Pattern: looks for anything after the first dot and before the @
 VIT_EMAIL_REGEX = r"^[a-zA-Z]+\.([a-zA-Z0-9]+)@vitbhopal\.ac\.in$"
 
-def safe_execute(query, retries=3, delay=1):
-    for attempt in range(retries):
-        try:
-            return query.execute()
-
-        except (httpx.RemoteProtocolError, httpx.ConnectError) as e:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2 
-            
-        except httpx.TimeoutException:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2
-
-        except APIError:
-            raise
-
 auth_bp = Blueprint(
     "auth",
     __name__,
@@ -69,9 +52,15 @@ class LoginRequestSchema(Schema):
 class LoginResponseSchema(Schema):
     """Successful login response"""
     token = fields.Str(metadata={"example": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."})
+    refresh_token = fields.Str(allow_none=True, metadata={"example": "3f0c...e1.Zk9x..."})
     role = fields.Str(metadata={"example": "admin"})
 
 
+class RefreshRequestSchema(Schema):
+    """Refresh request payload"""
+    refresh_token = fields.Str(required=True)
+
+
 class LogoutResponseSchema(Schema):
     success = fields.Boolean(metadata={"example": True})
 
@@ -109,7 +98,7 @@ def login(data):
 
         current_app.logger.debug("SUPABASE RESPONSE: %s", res.data)
 
-    except (httpx.ConnectError, httpx.RemoteProtocolError) as e:
+    except (httpx.ConnectError, httpx.RemoteProtocolError, httpx.TimeoutException) as e:
         current_app.logger.exception("NETWORK ERROR during login")
         return jsonify({"error": "Network error. Please check your connection and try again."}), 503
     except Exception:
@@ -125,20 +114,29 @@ def login(data):
 
     user = res.data[0]
 
-    if not bcrypt.checkpw(
-        data["password"].encode("utf-8"),
-        user["password_hash"].encode("utf-8")
-    ):
+    try:
+        valid = check_password(data["password"], user["password_hash"])
+    except VerifierBusy:
+        current_app.logger.warning("LOGIN SHED: password checks saturated")
+        response = jsonify({"error": "Too many logins right now. Please try again in a few seconds."})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(LOGIN_RETRY_AFTER_SECONDS)
+        return response
+
+    if not valid:
         current_app.logger.warning(
             "INVALID PASSWORD",
             extra={"username": data.get("username")}
         )
         return jsonify({"error": "Invalid credentials"}), 401
 
+    # Issued first: the access token lifetime depends on refresh tokens being available
+    refresh_token = issue_refresh_token(user["id"])
     token = generate_token(
         user["id"],
         user["role"],
-        user["username"]
+        user["username"],
+        **token_context(user["id"], user["role"])
     )
 
     current_app.logger.info(
@@ -148,6 +146,30 @@ def login(data):
 
     return {
         "token": token,
+        "refresh_token": refresh_token,
+        "role": user["role"]
+    }
+
+
+@auth_bp.route("/refresh", methods=["POST"])
+@auth_bp.arguments(RefreshRequestSchema)
+@auth_bp.response(200, LoginResponseSchema)
+def refresh(data):
+    """
+    Exchange a refresh token for a new access token.
+    The refresh token is rotated: the response carries its replacement.
+    """
+    try:
+        user, refresh_token = redeem_refresh_token(data["refresh_token"])
+    except RefreshTokenError as e:
+        return jsonify({"error": str(e)}), 401
+
+    return {
+        "token": generate_token(
+            user["id"], user["role"], user["username"],
+            **token_context(user["id"], user["role"])
+        ),
+        "refresh_token": refresh_token,
         "role": user["role"]
     }
 
@@ -156,7 +178,12 @@ def login(data):
 @auth_bp.response(200, LogoutResponseSchema)
 @require_auth()
 def logout():
-    """Logout endpoint (client-side token discard)."""
+    """
+    Logout: revoke the current token so it stops working on every worker,
+    and the refresh token if one is sent in the body.
+    """
+    revoke_token(bearer_token())
+    revoke_refresh_token((request.get_json(silent=True) or {}).get("refresh_token"))
     return {"success": True}
 
 
@@ -180,7 +207,7 @@ def google_login():
     token = request.json.get("token")
     print(token)
     try:
-        idinfo = id_token.verify_oauth2_token(token, google_requests.Request(), GOOGLE_CLIENT_ID)
+        idinfo = verify_google_id_token(token, GOOGLE_CLIENT_ID)
         
         # 1. Internal Domain Check
         if idinfo.get('hd') != "vitbhopal.ac.in":
@@ -227,15 +254,20 @@ def google_login():
             current_app.logger.info(f"Linked Google account for user: {reg_no}")
 
         # 5. Generate PointX Token
-        pointx_token = generate_token(user["id"], user["role"], user["username"])
+        refresh_token = issue_refresh_token(user["id"])
+        pointx_token = generate_token(
+            user["id"], user["role"], user["username"],
+            **token_context(user["id"], user["role"])
+        )
         
         return jsonify({
             "token": pointx_token, 
+            "refresh_token": refresh_token,
             "role": user["role"],
             "reg_no": reg_no
         }), 200
 
-    except (httpx.ConnectError, httpx.RemoteProtocolError) as e:
+    except (httpx.ConnectError, httpx.RemoteProtocolError, httpx.TimeoutException) as e:
         current_app.logger.exception("NETWORK ERROR during Google login")
         return jsonify({"error": "Network error. Please check your connection and try again."}), 503
     except ValueError:
@@ -6,36 +6,45 @@ Stall routes:
 - view plays
 """
 
-from flask import  request, jsonify
-from flask_smorest import Blueprint
-from supabase_client import supabase
-from auth import require_auth
-import httpx
+import os
 import time
+import queue
+import threading
 
+from flask import  request, jsonify, current_app, Response, stream_with_context
+from flask_smorest import Blueprint
 from postgrest.exceptions import APIError
 
-stall_bp = Blueprint("stall", __name__)
-
-def safe_execute(query, retries=3, delay=1):
-    for attempt in range(retries):
-        try:
-            return query.execute()
+from supabase_client import supabase
+from db import safe_execute
+from loaders import wallet_loader
+from cache import (
+    get_stall, get_stalls, get_active_sessions, get_active_stall_ids,
+    get_assigned_stall_ids
+)
+from events import change_feed, format_sse
+from conditional import conditional_json, etag_for, is_fresh, not_modified, row_version
+from auth import require_auth
 
-        except (httpx.RemoteProtocolError, httpx.ConnectError) as e:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2 
-            
-        except httpx.TimeoutException:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2
+stall_bp = Blueprint("stall", __name__)
 
-        except APIError:
-            raise
+# Single round-trip game start via the start_game_checked RPC
+# (sql/001_start_game_checked.sql). Set START_GAME_RPC=0 to force the
+# legacy multi-query path.
+START_GAME_RPC = os.getenv("START_GAME_RPC", "1") != "0"
+
+# SSE streams end after STREAM_MAX_SECONDS so operators pick up session
+# changes on reconnect; comments keep proxies from closing idle streams.
+STREAM_MAX_SECONDS = int(os.getenv("STREAM_MAX_SECONDS", "300"))
+STREAM_HEARTBEAT_SECONDS = 15
+# Each open stream holds a worker thread (gunicorn.conf.py runs gthread
+# workers); cap them per worker so dashboards cannot starve the API.
+# Clients over the cap get 503 and keep polling until a slot frees up.
+STREAM_MAX_PER_WORKER = int(os.getenv(
+    "STREAM_MAX_PER_WORKER",
+    str(max(1, int(os.getenv("GUNICORN_THREADS", "32")) // 2))
+))
+_stream_slots = threading.BoundedSemaphore(STREAM_MAX_PER_WORKER)
 
 def normalize_wallet_active(is_active_value):
     """
@@ -55,17 +64,13 @@ def my_active_stalls():
     """
     user_id = request.user["id"]
     
-    # Get active sessions with stall info
-    sessions = safe_execute(
-        supabase.table("stall_sessions")
-        .select("stall_id, started_at, stalls(stall_name, price_per_play, wallet_id)")
-        .eq("user_id", user_id)
-        .eq("is_active", True)
-    )
+    # Get active sessions, stall info comes from the stall cache
+    session_rows = get_active_sessions(user_id)
+    stall_map = get_stalls(s["stall_id"] for s in session_rows)
     
     active_stalls = []
-    for s in (sessions.data or []):
-        stall_info = s.get("stalls", {})
+    for s in session_rows:
+        stall_info = stall_map.get(s["stall_id"], {})
         active_stalls.append({
             "stall_id": s["stall_id"],
             "stall_name": stall_info.get("stall_name", "Unknown"),
@@ -92,54 +97,136 @@ def start_game():
 
     visitor_wallet_id = data["visitor_wallet"]
     stall_id = data.get("stall_id")
+    user_id = request.user["id"]
+
+    global START_GAME_RPC
+    if START_GAME_RPC:
+        try:
+            return start_game_checked(user_id, visitor_wallet_id, stall_id)
+        except APIError as e:
+            # PGRST202: function not deployed yet, fall back for this worker
+            if e.code != "PGRST202":
+                raise
+            current_app.logger.warning("start_game_checked RPC missing, using legacy start_game path")
+            START_GAME_RPC = False
+
+    return start_game_legacy(user_id, visitor_wallet_id, stall_id)
 
+
+@stall_bp.route("/stream", methods=["GET"])
+@require_auth(["operator"])
+def stream():
+    """
+    Server-Sent Events for the operator's active stalls:
+    pending_game, score and wallet events (see events.py).
+    Query param: stall_id (optional) - only this active stall.
+    """
+    user_id = request.user["id"]
+    stall_id_filter = request.args.get("stall_id")
+
+    stall_ids = get_active_stall_ids(user_id)
+    if stall_id_filter:
+        if stall_id_filter not in stall_ids:
+            return jsonify({"error": "You are not active for this stall"}), 403
+        stall_ids = [stall_id_filter]
+
+    if not stall_ids:
+        return jsonify({"error": "No active stall session found. Ask admin to activate your stall."}), 403
+
+    if not _stream_slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many live connections, falling back to polling"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+
+    def events():
+        sub = change_feed.subscribe(stall_ids)
+        ends_at = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            yield "retry: 3000\n"
+            yield format_sse({"event": "ready", "data": {"stall_ids": stall_ids}})
+            while time.monotonic() < ends_at:
+                if sub.overflowed:
+                    yield format_sse({"event": "resync", "data": {}})
+                    return
+                try:
+                    event = sub.queue.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            change_feed.unsubscribe(sub)
+
+    response = Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Released when the server closes the response, even if it never started
+    response.call_on_close(_stream_slots.release)
+    return response
+
+
+def start_game_checked(user_id, visitor_wallet_id, stall_id=None):
+    """
+    Validate and start a game in one database round trip.
+    Error codes and messages match start_game_legacy.
+    """
+    result = safe_execute(
+        supabase.rpc("start_game_checked", {
+            "p_user_id": user_id,
+            "p_visitor_wallet": visitor_wallet_id,
+            "p_stall_id": stall_id or None
+        })
+    )
+
+    outcome = result.data or {}
+    if not outcome.get("transaction_id"):
+        return jsonify({"error": outcome.get("error", "Failed to start game")}), outcome.get("status", 500)
+
+    change_feed.notify()
+    return jsonify({
+        "transaction_id": outcome["transaction_id"],
+        "stall_name": outcome["stall_name"],
+        "status": "started"
+    }), 201
+
+
+def start_game_legacy(user_id, visitor_wallet_id, stall_id=None):
+    """
+    Multi-query game start, used when start_game_checked is unavailable.
+    """
     # Backward compatibility for older clients:
     # if stall_id is not provided and operator has exactly one active stall,
     # auto-select that stall.
     if not stall_id:
-        sessions = safe_execute(
-            supabase.table("stall_sessions")
-            .select("stall_id")
-            .eq("user_id", request.user["id"])
-            .eq("is_active", True)
-        )
-
-        active_sessions = sessions.data or []
-        if len(active_sessions) == 1:
-            stall_id = active_sessions[0]["stall_id"]
-        elif len(active_sessions) == 0:
+        active_stall_ids = get_active_stall_ids(user_id)
+        if len(active_stall_ids) == 1:
+            stall_id = active_stall_ids[0]
+        elif len(active_stall_ids) == 0:
             return jsonify({"error": "No active stall session found. Ask admin to activate your stall."}), 403
         else:
             return jsonify({"error": "stall_id required when multiple active stalls exist"}), 400
     
     # Verify stall exists
-    stall_res = safe_execute(
-        supabase.table("stalls")
-        .select("id, stall_name")
-        .eq("id", stall_id)
-        .single()
-    )
+    stall = get_stall(stall_id)
     
-    if not stall_res.data:
+    if not stall:
         return jsonify({"error": "Stall not found"}), 404
     
     # Check user is assigned to stall
-    operator = safe_execute(
-        supabase.table("stall_operators")
-        .select("id")
-        .eq("stall_id", stall_id)
-        .eq("user_id", request.user["id"])
-    )
-
-    if not operator.data or len(operator.data) == 0:
+    # (from the token while its stall_version is current)
+    if stall_id not in get_assigned_stall_ids(request.user):
         return jsonify({"error": "You are not assigned to this stall"}), 403
 
     # Check user has ACTIVE SESSION for this stall
+    # (always against the database, the session cache may lag by its TTL)
     session = safe_execute(
         supabase.table("stall_sessions")
         .select("id")
         .eq("stall_id", stall_id)
-        .eq("user_id", request.user["id"])
+        .eq("user_id", user_id)
         .eq("is_active", True)
     )
     
@@ -186,9 +273,10 @@ def start_game():
     if not result.data:
         return jsonify({"error": "Failed to start game"}), 500
 
+    change_feed.notify()
     return jsonify({
         "transaction_id": result.data["transaction_id"],
-        "stall_name": stall_res.data["stall_name"],
+        "stall_name": stall["stall_name"],
         "status": "started"
     }), 201
 
@@ -205,6 +293,7 @@ def submit_score():
         "p_transaction_id": data["transaction_id"],
         "p_score": data["score"]
     }))
+    change_feed.notify()
 
     return jsonify(result.data), 200
 
@@ -220,24 +309,28 @@ def history():
     stall_id_filter = request.args.get("stall_id")
 
     # Get active stalls for this operator
-    sessions = safe_execute(
-        supabase.table("stall_sessions")
-        .select("stall_id")
-        .eq("user_id", user_id)
-        .eq("is_active", True)
-    )
+    active_stall_ids = get_active_stall_ids(user_id)
 
-    if not sessions.data or len(sessions.data) == 0:
+    if not active_stall_ids:
         return jsonify([]), 200
 
-    active_stall_ids = [s["stall_id"] for s in sessions.data]
-
     # Filter by specific stall if provided
     if stall_id_filter:
         if stall_id_filter not in active_stall_ids:
             return jsonify({"error": "You are not active for this stall"}), 403
         active_stall_ids = [stall_id_filter]
 
+    # Scoring bumps row_version, so one probe tells whether history changed
+    version = row_version(
+        supabase.table("transactions")
+        .select("row_version")
+        .in_("stall_id", active_stall_ids)
+        .eq("type", "play")
+    )
+    tag = etag_for("stall-history", sorted(active_stall_ids), version) if version else None
+    if is_fresh(tag):
+        return not_modified(tag)
+
     tx_res = safe_execute(
         supabase.table("transactions")
         .select("id, from_wallet, stall_id, score, points_amount, created_at")
@@ -250,42 +343,29 @@ def history():
     if not tx_res.data or len(tx_res.data) == 0:
         return jsonify([]), 200
 
-    # Get visitor usernames
-    wallet_ids = list({tx["from_wallet"] for tx in tx_res.data if tx.get("from_wallet")})
-    wallet_map = {}
-    if wallet_ids:
-        wallet_res = safe_execute(
-            supabase.table("wallets")
-            .select("id, username")
-            .in_("id", wallet_ids)
-        )
-        wallet_map = {w["id"]: w["username"] for w in (wallet_res.data or [])}
-
-    # Get stall names
-    stall_res = safe_execute(
-        supabase.table("stalls")
-        .select("id, stall_name")
-        .in_("id", active_stall_ids)
-    )
-    stall_map = {s["id"]: s["stall_name"] for s in (stall_res.data or [])}
+    # Get visitor usernames and stall names
+    wallet_map = wallet_loader().load_many(tx.get("from_wallet") for tx in tx_res.data)
+    stall_map = get_stalls(active_stall_ids)
 
     history_rows = []
     for tx in tx_res.data:
         points = tx.get("points_amount")
+        visitor = wallet_map.get(tx.get("from_wallet"))
+        stall = stall_map.get(tx.get("stall_id"))
         history_rows.append({
             "id": tx["id"],  # legacy compatibility
             "transaction_id": tx["id"],
             "visitor_wallet": tx.get("from_wallet"),
-            "visitor_username": wallet_map.get(tx.get("from_wallet"), "Unknown"),
+            "visitor_username": visitor["username"] if visitor else "Unknown",
             "stall_id": tx.get("stall_id"),
-            "stall_name": stall_map.get(tx.get("stall_id"), "Unknown"),
+            "stall_name": stall["stall_name"] if stall else "Unknown",
             "score": tx.get("score"),
             "points": points if points is not None else 0,
             "points_amount": points if points is not None else 0,
             "created_at": tx.get("created_at")
         })
 
-    return jsonify(history_rows), 200
+    return conditional_json(history_rows, tag=tag)
 
 @stall_bp.route("/visitor-balance/<wallet_id>", methods=["GET"])
 @require_auth(["operator"])
@@ -323,13 +403,7 @@ def wallet():
     user_id = request.user["id"]
     stall_id = request.args.get("stall_id")
 
-    sessions = safe_execute(
-        supabase.table("stall_sessions")
-        .select("stall_id")
-        .eq("user_id", user_id)
-        .eq("is_active", True)
-    )
-    active_stall_ids = [s["stall_id"] for s in (sessions.data or [])]
+    active_stall_ids = get_active_stall_ids(user_id)
 
     # Resolve stall context for modern operator flow
     if stall_id:
@@ -342,17 +416,12 @@ def wallet():
             return jsonify({"error": "stall_id required when multiple active stalls exist"}), 400
 
     if stall_id:
-        stall_res = safe_execute(
-            supabase.table("stalls")
-            .select("id, stall_name, wallet_id")
-            .eq("id", stall_id)
-            .single()
-        )
+        stall = get_stall(stall_id)
 
-        if not stall_res.data:
+        if not stall:
             return jsonify({"error": "Stall not found"}), 404
 
-        wallet_id = stall_res.data.get("wallet_id")
+        wallet_id = stall.get("wallet_id")
         if not wallet_id:
             return jsonify({"error": "Stall wallet not found"}), 404
 
@@ -366,13 +435,13 @@ def wallet():
         if not wallet_res.data:
             return jsonify({"error": "Stall wallet not found"}), 404
 
-        return jsonify({
-            "stall_id": stall_res.data["id"],
-            "stall_name": stall_res.data["stall_name"],
+        return conditional_json({
+            "stall_id": stall["id"],
+            "stall_name": stall["stall_name"],
             "wallet_id": wallet_res.data["id"],
             "balance": wallet_res.data["balance"],
             "is_active": normalize_wallet_active(wallet_res.data.get("is_active"))
-        }), 200
+        })
 
     # Legacy fallback: direct operator wallet tied to user_id
     wallet_res = safe_execute(
@@ -385,11 +454,11 @@ def wallet():
         return jsonify({"error": "No wallet found. Use /my-active-stalls to see your active stalls."}), 404
 
     wallet = wallet_res.data[0]
-    return jsonify({
+    return conditional_json({
         "wallet_id": wallet["id"],
         "balance": wallet["balance"],
         "is_active": normalize_wallet_active(wallet.get("is_active"))
-    }), 200
+    })
 
 @stall_bp.route("/debug", methods=["GET"])
 @require_auth(["operator"])
@@ -401,18 +470,13 @@ def debug_stall_context():
     user_id = request.user["id"]
     requested_stall_id = request.args.get("stall_id")
 
-    sessions = safe_execute(
-        supabase.table("stall_sessions")
-        .select("stall_id, started_at, stalls(stall_name, price_per_play, wallet_id)")
-        .eq("user_id", user_id)
-        .eq("is_active", True)
-    )
-    session_rows = sessions.data or []
+    session_rows = get_active_sessions(user_id)
+    stall_map = get_stalls(row["stall_id"] for row in session_rows)
 
     active_stalls = []
     active_stall_ids = []
     for row in session_rows:
-        stall_info = row.get("stalls", {})
+        stall_info = stall_map.get(row["stall_id"], {})
         active_stall_ids.append(row["stall_id"])
         active_stalls.append({
             "stall_id": row["stall_id"],
@@ -436,14 +500,7 @@ def debug_stall_context():
     selected_wallet = None
     pending_games_count = 0
     if selected_stall_id:
-        stall_res = safe_execute(
-            supabase.table("stalls")
-            .select("id, stall_name, wallet_id")
-            .eq("id", selected_stall_id)
-            .single()
-        )
-
-        stall_data = stall_res.data or {}
+        stall_data = get_stall(selected_stall_id) or {}
         wallet_id = stall_data.get("wallet_id")
 
         if wallet_id:
@@ -492,18 +549,11 @@ def pending_games():
     stall_id_filter = request.args.get("stall_id")
     
     # Get active stalls for this operator
-    sessions = safe_execute(
-        supabase.table("stall_sessions")
-        .select("stall_id")
-        .eq("user_id", user_id)
-        .eq("is_active", True)
-    )
+    active_stall_ids = get_active_stall_ids(user_id)
     
-    if not sessions.data or len(sessions.data) == 0:
+    if not active_stall_ids:
         return jsonify([]), 200
     
-    active_stall_ids = [s["stall_id"] for s in sessions.data]
-    
     # Filter by specific stall if provided
     if stall_id_filter:
         if stall_id_filter not in active_stall_ids:
@@ -523,32 +573,21 @@ def pending_games():
     if not tx_res.data or len(tx_res.data) == 0:
         return jsonify([]), 200
 
-    # Get wallet info
-    wallet_ids = list({tx["from_wallet"] for tx in tx_res.data})
-    wallet_res = safe_execute(
-        supabase.table("wallets")
-        .select("id, username")
-        .in_("id", wallet_ids)
-    )
-    wallet_map = {w["id"]: w["username"] for w in (wallet_res.data or [])}
-    
-    # Get stall info
-    stall_res = safe_execute(
-        supabase.table("stalls")
-        .select("id, stall_name")
-        .in_("id", active_stall_ids)
-    )
-    stall_map = {s["id"]: s["stall_name"] for s in (stall_res.data or [])}
+    # Get wallet and stall info
+    wallet_map = wallet_loader().load_many(tx["from_wallet"] for tx in tx_res.data)
+    stall_map = get_stalls(active_stall_ids)
 
     pending = []
     for tx in tx_res.data:
+        visitor = wallet_map.get(tx["from_wallet"])
+        stall = stall_map.get(tx["stall_id"])
         pending.append({
             "id": tx["id"],  # legacy compatibility
             "transaction_id": tx["id"],
             "visitor_wallet": tx["from_wallet"],
-            "visitor_username": wallet_map.get(tx["from_wallet"], "Unknown"),
+            "visitor_username": visitor["username"] if visitor else "Unknown",
             "stall_id": tx["stall_id"],
-            "stall_name": stall_map.get(tx["stall_id"], "Unknown"),
+            "stall_name": stall["stall_name"] if stall else "Unknown",
             "created_at": tx["created_at"]
         })
 
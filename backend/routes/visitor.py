@@ -8,121 +8,102 @@ from flask import  jsonify,request
 from flask_smorest import Blueprint
 
 from supabase_client import supabase
+from db import safe_execute
+from conditional import conditional_json
+from cache import is_known_proof
+from pagination import paginate, page_headers, page_limit, page_offset
+import leaderboard as leaderboard_store
 from auth import require_auth, generate_token
+from topups import pipeline, PipelineBusy, hash_image
 from PIL import Image
 import io
-import httpx
-import time
 
-from postgrest.exceptions import APIError
-
-def safe_execute(query, retries=3, delay=1):
-    for attempt in range(retries):
-        try:
-            return query.execute()
-
-        except (httpx.RemoteProtocolError, httpx.ConnectError) as e:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2 
-            
-        except httpx.TimeoutException:
-            if attempt == retries - 1:
-                raise
-            time.sleep(delay)
-            delay *= 2
-
-        except APIError:
-            raise
-
-
-def compress_image(
-    file_bytes: bytes,
-    max_width: int = 1280,
-    quality: int = 65
-) -> bytes:
-    img = Image.open(io.BytesIO(file_bytes))
-
-    # Convert to RGB (important for JPEG)
-    if img.mode != "RGB":
-        img = img.convert("RGB")
-
-    # Resize if too wide
-    if img.width > max_width:
-        ratio = max_width / img.width
-        new_size = (max_width, int(img.height * ratio))
-        img = img.resize(new_size, Image.LANCZOS)
-
-    output = io.BytesIO()
-    img.save(
-        output,
-        format="JPEG",
-        quality=quality,
-        optimize=True
-    )
-    return output.getvalue()
-
-import hashlib
+visitor_bp = Blueprint("visitor", __name__)
 
-def hash_image(file_bytes: bytes) -> str:
-    return hashlib.sha256(file_bytes).hexdigest()
 
-
-visitor_bp = Blueprint("visitor", __name__)
+def own_wallet_query(columns):
+    """
+    wallets query for the caller: by primary key when the token carries
+    wallet_id, by user_id for tokens issued before it did.
+    """
+    query = supabase.table("wallets").select(columns)
+    wallet_id = request.user.get("wallet_id")
+    if wallet_id:
+        return query.eq("id", wallet_id)
+    return query.eq("user_id", request.user["id"])
 
 
 @visitor_bp.route("/wallet", methods=["GET"])
 @require_auth(["visitor"])
 def wallet():
-    user_id = request.user["id"]
-
-    res = safe_execute(
-        supabase.table("wallets")
-        .select("id, balance, is_active")
-        .eq("user_id", user_id)
-    )
+    res = safe_execute(own_wallet_query("id, balance, is_active"))
 
     if not res.data:
         return jsonify({"error": "Wallet not found"}), 404
 
     wallet = res.data[0]   # ← this is now a dict
 
-    return jsonify({
+    return conditional_json({
         "wallet_id": wallet["id"],
         "balance": wallet["balance"],
         "is_active": wallet["is_active"]
-    }), 200
+    })
 
 
 
 
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
 @visitor_bp.route("/history", methods=["GET"])
 @require_auth(["visitor"])
 def history():
-    user_id = request.user["id"]
+    """
+    Visitor transactions, newest first, keyset paginated.
+    Query params: limit, cursor (older page) or since (only newer rows).
+    """
+    limit = page_limit(HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
 
-    res = safe_execute(supabase.table("wallets") \
-        .select("id") \
-        .eq("user_id", user_id) )
+    wallet_id = request.user.get("wallet_id")
+    if not wallet_id:
+        res = safe_execute(own_wallet_query("id"))
 
-    if not res.data:
-        return jsonify({"error": "Wallet not found"}), 404
+        if not res.data:
+            return jsonify({"error": "Wallet not found"}), 404
+
+        wallet_id = res.data[0]["id"]
 
-    wallet_id = res.data[0]["id"]
+    query = supabase.table("transactions") \
+        .select("id, from_wallet, to_wallet, points_amount, type, created_at")
+    query, newer = paginate(query, limit, [
+        f"or(from_wallet.eq.{wallet_id},to_wallet.eq.{wallet_id})"
+    ])
 
-    res = safe_execute(supabase.table("transactions") \
-        .select("id, from_wallet, to_wallet, points_amount, type, created_at") \
-        .or_(f"from_wallet.eq.{wallet_id},to_wallet.eq.{wallet_id}") \
-        .order("created_at", desc=True) )
+    res = safe_execute(query)
+    rows, headers = page_headers(res.data or [], limit, newer)
 
-    return jsonify(res.data), 200
+    return jsonify(rows), 200, headers
     
 @visitor_bp.route("/leaderboard", methods=["GET"])
 @require_auth(["visitor", "admin"])
 def leaderboard():
-    res = safe_execute(supabase.rpc("visitor_leaderboard"))
-    return jsonify(res.data), 200
+    """
+    Leaderboard top-K.
+    Query params: limit (default 50, max 200), offset
+    """
+    limit = page_limit(leaderboard_store.PAGE_SIZE, leaderboard_store.MAX_PAGE_SIZE)
+    return jsonify(leaderboard_store.top(limit, page_offset())), 200
+
+
+@visitor_bp.route("/leaderboard/me", methods=["GET"])
+@require_auth(["visitor"])
+def my_rank():
+    """Rank and total score of the calling visitor."""
+    row = leaderboard_store.rank_of(request.user["id"])
+    if not row:
+        return jsonify({"rank": None, "total_score": 0}), 200
+    return jsonify(row), 200
 
 @visitor_bp.route("/topup-test", methods=["GET"])
 @visitor_bp.route("/debug/topup", methods=["GET"])
@@ -171,7 +152,8 @@ def test_topup_dependencies():
                 "topup_requests_table": table_status
             },
             "image_processing": {
-                "functions": "✅ Available" if 'compress_image' in globals() and 'hash_image' in globals() else "❌ Missing"
+                "pipeline": "✅ Running" if pipeline.is_running() else "❌ Not running",
+                "queue_depth": pipeline.depth()
             }
         }), 200
         
@@ -211,18 +193,25 @@ def create_topup_request():
         except Exception as e:
             return jsonify({"error": f"Failed to read uploaded file: {str(e)}"}), 400
 
-        # Process image
+        image_hash = hash_image(raw_bytes)
+
+        # Reject known proofs before any decode, resize or upload
+        try:
+            if is_known_proof(image_hash):
+                return jsonify({"error": "Duplicate payment proof detected"}), 409
+        except Exception as e:
+            return jsonify({"error": f"Failed to check payment proof: {str(e)}"}), 500
+
+        # Sniff the header only; decoding and compression happen in the pipeline
         try:
-            image_hash = hash_image(raw_bytes)
-            compressed = compress_image(raw_bytes)
+            Image.open(io.BytesIO(raw_bytes))
         except Exception as e:
             return jsonify({"error": f"Failed to process image: {str(e)}"}), 400
 
         # Get wallet
         try:
-            wallet_res = safe_execute(supabase.table("wallets") \
-                .select("id, is_active") \
-                .eq("user_id", user_id) )
+            # is_active must be current, so this read stays (by primary key)
+            wallet_res = safe_execute(own_wallet_query("id, is_active"))
 
             if not wallet_res.data:
                 return jsonify({"error": "Wallet not found"}), 404
@@ -234,45 +223,34 @@ def create_topup_request():
         except Exception as e:
             return jsonify({"error": f"Failed to fetch wallet: {str(e)}"}), 500
 
-        # Upload to storage
+        # Compress, upload and insert in the background
         try:
-            path = f"topups/{user_id}/{image_hash}.jpg"
-            
-            upload_result = supabase.storage.from_("payments").upload(
-                path,
-                compressed,
-                {"content-type": "image/jpeg"}
-            )
-            
-            # Check if upload was successful
-            if hasattr(upload_result, 'error') and upload_result.error:
-                return jsonify({"error": f"Storage upload failed: {upload_result.error}"}), 500
-                
-        except Exception as e:
-            return jsonify({"error": f"Failed to upload image to storage: {str(e)}"}), 500
+            job_id = pipeline.submit(user_id, wallet_id, amount, raw_bytes, image_hash)
+        except PipelineBusy:
+            response = jsonify({"error": "Too many topup uploads in progress, try again shortly"})
+            response.status_code = 503
+            response.headers["Retry-After"] = "5"
+            return response
 
-        # Insert topup request
-        try:
-            insert_result = safe_execute(supabase.table("topup_requests").insert({
-                "user_id": user_id,
-                "wallet_id": wallet_id,
-                "amount": amount,
-                "image_path": path,
-                "image_hash": image_hash
-            }))
-            
-            if hasattr(insert_result, 'error') and insert_result.error:
-                return jsonify({"error": f"Failed to create topup request: {insert_result.error}"}), 500
-                
-        except Exception as e:
-            error_msg = str(e)
-            if "duplicate" in error_msg.lower() or "unique" in error_msg.lower():
-                return jsonify({"error": "Duplicate payment proof detected"}), 409
-            return jsonify({"error": f"Failed to create topup request: {error_msg}"}), 500
-
-        return jsonify({"status": "pending"}), 201
+        return jsonify({
+            "status": "queued",
+            "job_id": job_id,
+            "status_url": f"/api/visitor/topup-request/{job_id}"
+        }), 202
 
     except Exception as e:
         # Catch-all error handler
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+
+@visitor_bp.route("/topup-request/<job_id>", methods=["GET"])
+@require_auth(["visitor"])
+def topup_request_status(job_id):
+    """
+    Status of a queued topup upload: queued, processing, pending
+    (created, awaiting admin review), duplicate or failed (with error).
+    """
+    status = pipeline.status(job_id, request.user["id"])
+    if status is None:
+        return jsonify({"error": "Unknown topup job"}), 404
+    return jsonify(status), 200
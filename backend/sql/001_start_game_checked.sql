@@ -0,0 +1,122 @@
+-- PointX: single round-trip game start
+--
+-- Runs every check /api/stall/play used to make over PostgREST (active
+-- session, stall, operator assignment, visitor wallet, active game) and
+-- then calls start_game_play, all in one transaction.
+--
+-- Returns jsonb:
+--   success: {"transaction_id": ..., "stall_name": ..., "status": 201}
+--   failure: {"error": <message>, "status": <http status>}
+-- Error messages match the legacy endpoint exactly.
+
+create or replace function public.start_game_checked(
+    p_user_id uuid,
+    p_visitor_wallet uuid,
+    p_stall_id uuid default null
+)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_stall_id uuid := p_stall_id;
+    v_active_ids uuid[];
+    v_stall_name text;
+    v_balance numeric;
+    v_wallet_active boolean;
+    v_result jsonb;
+begin
+    -- Older clients omit stall_id: auto-select the only active stall
+    if v_stall_id is null then
+        select array_agg(stall_id)
+          into v_active_ids
+          from stall_sessions
+         where user_id = p_user_id
+           and is_active = true;
+
+        if coalesce(array_length(v_active_ids, 1), 0) = 0 then
+            return jsonb_build_object(
+                'error', 'No active stall session found. Ask admin to activate your stall.',
+                'status', 403);
+        elsif array_length(v_active_ids, 1) > 1 then
+            return jsonb_build_object(
+                'error', 'stall_id required when multiple active stalls exist',
+                'status', 400);
+        end if;
+
+        v_stall_id := v_active_ids[1];
+    end if;
+
+    select stall_name into v_stall_name from stalls where id = v_stall_id;
+    if not found then
+        return jsonb_build_object('error', 'Stall not found', 'status', 404);
+    end if;
+
+    if not exists (
+        select 1 from stall_operators
+         where stall_id = v_stall_id and user_id = p_user_id
+    ) then
+        return jsonb_build_object('error', 'You are not assigned to this stall', 'status', 403);
+    end if;
+
+    if not exists (
+        select 1 from stall_sessions
+         where stall_id = v_stall_id and user_id = p_user_id and is_active = true
+    ) then
+        return jsonb_build_object(
+            'error', 'You are not active for this stall. Ask admin to activate you.',
+            'status', 403);
+    end if;
+
+    -- Lock the visitor wallet so two booths cannot start games concurrently
+    select balance, is_active
+      into v_balance, v_wallet_active
+      from wallets
+     where id = p_visitor_wallet
+       for update;
+
+    if not found then
+        return jsonb_build_object('error', 'Visitor wallet not found', 'status', 404);
+    end if;
+
+    if not coalesce(v_wallet_active, false) then
+        return jsonb_build_object('error', 'Visitor wallet is frozen', 'status', 403);
+    end if;
+
+    if v_balance <= 0 then
+        return jsonb_build_object('error', 'Insufficient balance', 'status', 400);
+    end if;
+
+    if exists (
+        select 1 from transactions
+         where from_wallet = p_visitor_wallet
+           and type = 'play'
+           and score is null
+    ) then
+        return jsonb_build_object('error', 'Visitor already has an active game', 'status', 409);
+    end if;
+
+    v_result := to_jsonb(start_game_play(
+        p_visitor_wallet => p_visitor_wallet,
+        p_stall_id => v_stall_id));
+
+    if v_result is null or v_result->>'transaction_id' is null then
+        return jsonb_build_object('error', 'Failed to start game', 'status', 500);
+    end if;
+
+    return jsonb_build_object(
+        'transaction_id', v_result->>'transaction_id',
+        'stall_name', v_stall_name,
+        'status', 201);
+end;
+$$;
+
+-- Supports the active-game check above
+create index if not exists transactions_pending_play_idx
+    on transactions (from_wallet)
+    where type = 'play' and score is null;
+
+-- Trusts p_user_id, so only the backend may call it
+revoke execute on function public.start_game_checked(uuid, uuid, uuid) from public, anon, authenticated;
+grant execute on function public.start_game_checked(uuid, uuid, uuid) to service_role;
@@ -0,0 +1,11 @@
+-- PointX: indexes for keyset-paginated visitor history
+--
+-- /api/visitor/history pages on (created_at, id) over transactions that
+-- touch a wallet from either side; each branch of the OR gets its own
+-- index so Postgres can merge two ordered index scans.
+
+create index if not exists transactions_from_wallet_created_idx
+    on transactions (from_wallet, created_at desc, id desc);
+
+create index if not exists transactions_to_wallet_created_idx
+    on transactions (to_wallet, created_at desc, id desc);
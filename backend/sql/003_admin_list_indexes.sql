@@ -0,0 +1,22 @@
+-- PointX: indexes for keyset-paginated admin lists
+--
+-- /api/admin/transactions, /plays, /users and /wallets order by
+-- (created_at, id) and filter on type, stall or role.
+
+create index if not exists transactions_created_idx
+    on transactions (created_at desc, id desc);
+
+create index if not exists transactions_type_created_idx
+    on transactions (type, created_at desc, id desc);
+
+create index if not exists transactions_stall_created_idx
+    on transactions (stall_id, created_at desc, id desc);
+
+create index if not exists users_created_idx
+    on users (created_at desc, id desc);
+
+create index if not exists users_role_created_idx
+    on users (role, created_at desc, id desc);
+
+create index if not exists wallets_created_idx
+    on wallets (created_at desc, id desc);
@@ -0,0 +1,102 @@
+-- PointX: incrementally maintained visitor leaderboard
+--
+-- leaderboard_scores holds one row per visitor with the running total of
+-- their play scores. A trigger on transactions adds the score when
+-- submit_game_score fills it in, so reads never aggregate over plays.
+-- total_score matches visitor_leaderboard: sum of scores of scored plays.
+
+create table if not exists leaderboard_scores (
+    user_id uuid primary key,
+    wallet_id uuid not null,
+    username text,
+    total_score bigint not null default 0,
+    plays integer not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists leaderboard_scores_rank_idx
+    on leaderboard_scores (total_score desc, user_id);
+
+create or replace function public.leaderboard_apply_score()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_delta bigint;
+begin
+    if new.type <> 'play' or new.score is null then
+        return new;
+    end if;
+
+    v_delta := new.score - coalesce(old.score, 0);
+    if tg_op = 'UPDATE' and old.score is not null and v_delta = 0 then
+        return new;
+    end if;
+
+    insert into leaderboard_scores as lb (user_id, wallet_id, username, total_score, plays)
+    select w.user_id, w.id, w.username, v_delta, 1
+      from wallets w
+     where w.id = new.from_wallet
+       and w.user_id is not null
+    on conflict (user_id) do update
+       set total_score = lb.total_score + excluded.total_score,
+           plays = lb.plays + case when old.score is null then 1 else 0 end,
+           username = excluded.username,
+           updated_at = now();
+
+    return new;
+end;
+$$;
+
+drop trigger if exists transactions_leaderboard on transactions;
+create trigger transactions_leaderboard
+    after insert or update of score on transactions
+    for each row
+    execute function public.leaderboard_apply_score();
+
+-- Rank lookup for one visitor: position in the same order the list uses
+-- (total_score desc, user_id), so tied visitors see one rank everywhere
+create or replace function public.leaderboard_rank(p_user_id uuid)
+returns jsonb
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select jsonb_build_object(
+        'user_id', me.user_id,
+        'username', me.username,
+        'total_score', me.total_score,
+        'rank', (select count(*) from leaderboard_scores o
+                  where o.total_score > me.total_score
+                     or (o.total_score = me.total_score and o.user_id < me.user_id)) + 1,
+        'total_players', (select count(*) from leaderboard_scores)
+    )
+      from leaderboard_scores me
+     where me.user_id = p_user_id;
+$$;
+
+-- Backend (service_role) only: no direct access with the anon key
+alter table leaderboard_scores enable row level security;
+revoke all on leaderboard_scores from public, anon, authenticated;
+grant select on leaderboard_scores to service_role;
+
+revoke execute on function public.leaderboard_rank(uuid) from public, anon, authenticated;
+grant execute on function public.leaderboard_rank(uuid) to service_role;
+
+-- Backfill from existing plays
+insert into leaderboard_scores (user_id, wallet_id, username, total_score, plays)
+select w.user_id, w.id, w.username, sum(t.score), count(*)
+  from transactions t
+  join wallets w on w.id = t.from_wallet
+ where t.type = 'play'
+   and t.score is not null
+   and w.user_id is not null
+ group by w.user_id, w.id, w.username
+on conflict (user_id) do update
+   set total_score = excluded.total_score,
+       plays = excluded.plays,
+       username = excluded.username,
+       updated_at = now();
@@ -0,0 +1,62 @@
+-- PointX: row versions for conditional GET
+--
+-- Every insert/update takes a new row_version from one shared sequence,
+-- so polled endpoints can compute an ETag from max(row_version) with one
+-- indexed probe and answer 304 without re-reading and enriching the full
+-- list. A sequence is used rather than now(): now() is the transaction
+-- start time, so a transaction that started earlier but commits later
+-- would not move max(updated_at) and pollers would keep getting 304.
+--
+-- Versions are still taken when the row is written, not at commit. Keep
+-- writes to these tables in short transactions.
+-- updated_at is kept for humans and uses the wall clock at write time.
+
+create sequence if not exists row_version_seq;
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := clock_timestamp();
+    new.row_version := nextval('row_version_seq');
+    return new;
+end;
+$$;
+
+alter table transactions add column if not exists updated_at timestamptz not null default now();
+alter table wallets add column if not exists updated_at timestamptz not null default now();
+alter table topup_requests add column if not exists updated_at timestamptz not null default now();
+
+alter table transactions add column if not exists row_version bigint not null default nextval('row_version_seq');
+alter table wallets add column if not exists row_version bigint not null default nextval('row_version_seq');
+alter table topup_requests add column if not exists row_version bigint not null default nextval('row_version_seq');
+
+drop trigger if exists transactions_touch on transactions;
+create trigger transactions_touch
+    before insert or update on transactions
+    for each row execute function public.touch_updated_at();
+
+drop trigger if exists wallets_touch on wallets;
+create trigger wallets_touch
+    before insert or update on wallets
+    for each row execute function public.touch_updated_at();
+
+drop trigger if exists topup_requests_touch on topup_requests;
+create trigger topup_requests_touch
+    before insert or update on topup_requests
+    for each row execute function public.touch_updated_at();
+
+-- /api/stall/history probe: newest change among a stall's plays
+drop index if exists transactions_stall_updated_idx;
+create index if not exists transactions_stall_version_idx
+    on transactions (stall_id, row_version desc)
+    where type = 'play';
+
+drop index if exists wallets_updated_idx;
+create index if not exists wallets_version_idx
+    on wallets (row_version desc);
+
+drop index if exists topup_requests_updated_idx;
+create index if not exists topup_requests_version_idx
+    on topup_requests (row_version desc);
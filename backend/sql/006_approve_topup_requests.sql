@@ -0,0 +1,70 @@
+-- PointX: batch top-up approval
+--
+-- Approves many pending top-up requests in one transaction by calling
+-- approve_topup_request for each. Every request runs in its own
+-- subtransaction, so one failure is reported without undoing the rest.
+-- The API calls it with at most 50 ids at a time: row_version (sql/005)
+-- is taken at write time, so long transactions would let pollers cache an
+-- ETag over rows that commit later.
+--
+-- Returns a jsonb array, one entry per distinct request id, in input order:
+--   {"request_id": ..., "status": "approved"}
+--   {"request_id": ..., "status": "not_found"}
+--   {"request_id": ..., "status": "skipped", "error": "Request is <status>"}
+--   {"request_id": ..., "status": "error", "error": <message>}
+
+create or replace function public.approve_topup_requests(
+    p_request_ids uuid[],
+    p_admin_id uuid
+)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_id uuid;
+    v_status text;
+    v_outcomes jsonb := '[]'::jsonb;
+begin
+    for v_id in
+        select id
+          from unnest(p_request_ids) with ordinality as t(id, pos)
+         group by id
+         order by min(pos)
+    loop
+        select status into v_status
+          from topup_requests
+         where id = v_id
+           for update;
+
+        if not found then
+            v_outcomes := v_outcomes || jsonb_build_object(
+                'request_id', v_id, 'status', 'not_found');
+            continue;
+        end if;
+
+        if v_status <> 'pending' then
+            v_outcomes := v_outcomes || jsonb_build_object(
+                'request_id', v_id, 'status', 'skipped',
+                'error', 'Request is ' || v_status);
+            continue;
+        end if;
+
+        begin
+            perform approve_topup_request(p_request_id => v_id, p_admin_id => p_admin_id);
+            v_outcomes := v_outcomes || jsonb_build_object(
+                'request_id', v_id, 'status', 'approved');
+        exception when others then
+            v_outcomes := v_outcomes || jsonb_build_object(
+                'request_id', v_id, 'status', 'error', 'error', sqlerrm);
+        end;
+    end loop;
+
+    return v_outcomes;
+end;
+$$;
+
+-- Trusts p_admin_id, so only the backend may call it
+revoke execute on function public.approve_topup_requests(uuid[], uuid) from public, anon, authenticated;
+grant execute on function public.approve_topup_requests(uuid[], uuid) to service_role;
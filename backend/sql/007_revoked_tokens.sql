@@ -0,0 +1,23 @@
+-- PointX: revoked access tokens
+--
+-- /api/auth/logout records the token's jti here until the token would
+-- have expired anyway. Workers reload unexpired rows periodically
+-- (TOKEN_REVOCATION_REFRESH_SECONDS) instead of checking per request.
+
+create table if not exists revoked_tokens (
+    jti text primary key,
+    expires_at timestamptz not null,
+    revoked_at timestamptz not null default now()
+);
+
+create index if not exists revoked_tokens_expires_idx
+    on revoked_tokens (expires_at);
+
+-- Only the backend (service_role) may touch this table; with the anon key
+-- a client could otherwise read every revoked jti or delete rows to undo logouts
+alter table revoked_tokens enable row level security;
+revoke all on revoked_tokens from public, anon, authenticated;
+grant select, insert, update, delete on revoked_tokens to service_role;
+
+-- Expired rows are never read again; prune them periodically, e.g.
+-- delete from revoked_tokens where expires_at < now();
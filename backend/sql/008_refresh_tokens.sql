@@ -0,0 +1,29 @@
+-- PointX: refresh tokens
+--
+-- A refresh token is "<id>.<secret>". Only the SHA-256 of the secret is
+-- stored (base64url, 43 chars), so a leaked table cannot be replayed.
+-- /api/auth/refresh looks a token up by primary key, rotates it and
+-- issues a new access token without touching bcrypt.
+
+create table if not exists refresh_tokens (
+    id uuid primary key,
+    user_id uuid not null references users(id) on delete cascade,
+    token_hash text not null,
+    expires_at timestamptz not null,
+    revoked_at timestamptz,
+    created_at timestamptz not null default now()
+);
+
+-- Revoking every session of a user
+create index if not exists refresh_tokens_user_idx
+    on refresh_tokens (user_id)
+    where revoked_at is null;
+
+-- Only the backend (service_role) may touch this table; with the anon key
+-- a client could otherwise insert a row for any user and redeem it
+alter table refresh_tokens enable row level security;
+revoke all on refresh_tokens from public, anon, authenticated;
+grant select, insert, update, delete on refresh_tokens to service_role;
+
+-- Expired and revoked rows are never accepted again; prune periodically, e.g.
+-- delete from refresh_tokens where expires_at < now() or revoked_at < now() - interval '1 day';
@@ -0,0 +1,29 @@
+-- PointX: stall assignment versions
+--
+-- Operator access tokens embed the operator's assigned stall ids together
+-- with users.stall_version at the time they were issued. Every change to
+-- a user's stall_operators rows bumps the version, so the API can tell a
+-- stale token apart and re-read stall_operators instead of trusting it.
+
+alter table users
+    add column if not exists stall_version integer not null default 0;
+
+create or replace function public.bump_stall_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update users set stall_version = stall_version + 1 where id = old.user_id;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and (tg_op = 'INSERT' or new.user_id is distinct from old.user_id) then
+        update users set stall_version = stall_version + 1 where id = new.user_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists stall_operators_bump_version on stall_operators;
+create trigger stall_operators_bump_version
+    after insert or update or delete on stall_operators
+    for each row execute function public.bump_stall_version();
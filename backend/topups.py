@@ -0,0 +1,416 @@
+"""
+PointX top-up proof pipeline
+/api/visitor/topup-request spools the upload to disk and answers 202;
+a small, fixed pool of worker threads per process then compresses the
+image, uploads it to the payments bucket and inserts the topup_requests
+row. The queue is bounded, so a burst of uploads is refused with 503
+instead of taking CPU from game and scoring requests.
+
+Job status is kept as small JSON files next to the spool, so any worker
+on the same host can answer /api/visitor/topup-request/<job_id>.
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import queue
+import hashlib
+import logging
+import tempfile
+import threading
+
+from PIL import Image
+from postgrest.exceptions import APIError
+
+from supabase_client import supabase
+from db import safe_execute
+from cache import is_known_proof, remember_proof
+
+logger = logging.getLogger(__name__)
+
+TOPUP_WORKERS = int(os.getenv("TOPUP_WORKERS", "2"))
+TOPUP_QUEUE_SIZE = int(os.getenv("TOPUP_QUEUE_SIZE", "32"))
+SPOOL_DIR = os.getenv("TOPUP_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "pointx-topups"))
+STATUS_TTL_SECONDS = 3600
+JOB_QUERY_TIMEOUT = 30
+THUMB_WIDTH = int(os.getenv("TOPUP_THUMB_WIDTH", "240"))
+THUMB_QUALITY = 60
+
+# Job states; "pending" means the request is waiting for admin review
+QUEUED = "queued"
+PROCESSING = "processing"
+PENDING = "pending"
+DUPLICATE = "duplicate"
+FAILED = "failed"
+
+
+def _prepare(img, max_width):
+    # Convert to RGB (important for JPEG)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Resize if too wide
+    if img.width > max_width:
+        ratio = max_width / img.width
+        new_size = (max_width, max(1, int(img.height * ratio)))
+        img = img.resize(new_size, Image.LANCZOS)
+    return img
+
+
+def _encode_jpeg(img, quality):
+    output = io.BytesIO()
+    img.save(
+        output,
+        format="JPEG",
+        quality=quality,
+        optimize=True
+    )
+    return output.getvalue()
+
+
+def compress_image(
+    file_bytes: bytes,
+    max_width: int = 1280,
+    quality: int = 65
+) -> bytes:
+    img = Image.open(io.BytesIO(file_bytes))
+    return _encode_jpeg(_prepare(img, max_width), quality)
+
+
+def compress_with_thumbnail(file_bytes: bytes) -> tuple:
+    """
+    Decode once and return (review JPEG, thumbnail JPEG). The thumbnail
+    is scaled down from the already resized review image.
+    """
+    img = _prepare(Image.open(io.BytesIO(file_bytes)), 1280)
+    thumb = _prepare(img, THUMB_WIDTH)
+    return _encode_jpeg(img, 65), _encode_jpeg(thumb, THUMB_QUALITY)
+
+
+def thumbnail_path(image_path):
+    """Storage path of the thumbnail stored next to a proof image."""
+    if not image_path:
+        return None
+    base, _, _ = image_path.rpartition(".")
+    return f"{base or image_path}.thumb.jpg"
+
+
+def hash_image(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+class PipelineBusy(Exception):
+    """The job queue is full; the client should retry later."""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError, ValueError):
+        return pid is not None
+    return True
+
+
+class TopupPipeline:
+    """
+    Bounded background queue for top-up proof processing.
+
+    Each queued job is spooled as <id>.upload plus a <id>.job descriptor
+    naming the owning process. A job whose owner is gone (worker restart
+    or crash after the client got 202) is re-queued by the next worker
+    that starts or sweeps, or marked failed if it no longer fits.
+    """
+
+    def __init__(self, workers=TOPUP_WORKERS, queue_size=TOPUP_QUEUE_SIZE, spool_dir=SPOOL_DIR):
+        self.workers = max(1, workers)
+        self.spool_dir = spool_dir
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._recovered_pid = None
+        # Job ids queued in this process
+        self._owned = set()
+
+    # ---------- submission ----------
+
+    def submit(self, user_id, wallet_id, amount, raw_bytes, image_hash):
+        """Spool the upload and queue it; returns the job id."""
+        if self._queue.full():
+            raise PipelineBusy()
+
+        self.start()
+
+        job_id = uuid.uuid4().hex
+        spool_path = os.path.join(self.spool_dir, f"{job_id}.upload")
+        with open(spool_path, "wb") as f:
+            f.write(raw_bytes)
+
+        job = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "wallet_id": wallet_id,
+            "amount": amount,
+            "image_hash": image_hash,
+            "spool_path": spool_path,
+        }
+        self._owned.add(job_id)
+        self._write_job(job)
+        self._set_status(job, QUEUED)
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._discard(job)
+            raise PipelineBusy()
+        return job_id
+
+    def status(self, job_id, user_id):
+        """Return the job's status dict, or None if unknown or not the user's."""
+        if not job_id.isalnum():
+            return None
+        self.start()
+        try:
+            with open(self._status_path(job_id)) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status.get("user_id") != user_id:
+            return None
+        return {k: v for k, v in status.items() if k != "user_id"}
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def is_running(self):
+        """True when workers are alive and the spool directory is writable."""
+        self.start()
+        with self._lock:
+            alive = sum(1 for t in self._threads if t.is_alive())
+        return alive == self.workers and os.access(self.spool_dir, os.W_OK)
+
+    # ---------- workers ----------
+
+    def start(self):
+        """Start workers and pick up jobs orphaned by other processes."""
+        self._ensure_workers()
+        self._sweep()
+
+    def recover(self):
+        """
+        Re-queue spooled jobs whose owning process is gone. Jobs that
+        cannot be re-queued (queue full, upload missing) are marked failed
+        so their status does not stay "queued" forever.
+        """
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith(".job"):
+                continue
+            job = self._claim(os.path.join(self.spool_dir, name))
+            if job is None:
+                continue
+
+            if not os.path.exists(job["spool_path"]):
+                self._set_status(job, FAILED, error="Upload was interrupted, please submit it again")
+                self._discard(job)
+                continue
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._set_status(job, FAILED, error="Upload was interrupted, please submit it again")
+                self._discard(job)
+                continue
+            self._set_status(job, QUEUED)
+            logger.info("Re-queued top-up job %s from a stopped worker", job["job_id"])
+
+    def _claim(self, job_path):
+        """Take over an orphaned job descriptor; None if it is owned or taken."""
+        try:
+            with open(job_path) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._orphaned(job):
+            return None
+
+        # rename is atomic: only one process wins the claim
+        claim_path = f"{job_path}.{os.getpid()}"
+        try:
+            os.rename(job_path, claim_path)
+        except OSError:
+            return None
+        try:
+            with open(claim_path) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            os.remove(claim_path)
+            return None
+        if not self._orphaned(job):
+            # Someone else took it over between the read and the rename
+            os.replace(claim_path, job_path)
+            return None
+
+        self._owned.add(job["job_id"])
+        self._write_job(job)
+        os.remove(claim_path)
+        return job
+
+    def _orphaned(self, job):
+        pid = job.get("pid")
+        if pid == os.getpid():
+            return job.get("job_id") not in self._owned
+        return not _pid_alive(pid)
+
+    def _ensure_workers(self):
+        with self._lock:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"topup-worker-{len(self._threads)}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self.process(job)
+            except Exception as e:
+                logger.exception("Top-up job %s failed", job["job_id"])
+                self._set_status(job, FAILED, error=f"Internal server error: {str(e)}")
+            finally:
+                self._discard(job)
+                self._queue.task_done()
+
+    def process(self, job):
+        self._set_status(job, PROCESSING)
+
+        # An identical upload queued earlier may have been stored meanwhile
+        if is_known_proof(job["image_hash"]):
+            self._set_status(job, DUPLICATE, error="Duplicate payment proof detected")
+            return
+
+        with open(job["spool_path"], "rb") as f:
+            raw_bytes = f.read()
+
+        try:
+            compressed, thumbnail = compress_with_thumbnail(raw_bytes)
+        except Exception as e:
+            self._set_status(job, FAILED, error=f"Failed to process image: {str(e)}")
+            return
+
+        path = f"topups/{job['user_id']}/{job['image_hash']}.jpg"
+        try:
+            upload_result = supabase.storage.from_("payments").upload(
+                path,
+                compressed,
+                {"content-type": "image/jpeg"}
+            )
+            if hasattr(upload_result, 'error') and upload_result.error:
+                self._set_status(job, FAILED, error=f"Storage upload failed: {upload_result.error}")
+                return
+        except Exception as e:
+            self._set_status(job, FAILED, error=f"Failed to upload image to storage: {str(e)}")
+            return
+
+        # The review grid falls back to the full image without a thumbnail
+        try:
+            supabase.storage.from_("payments").upload(
+                thumbnail_path(path),
+                thumbnail,
+                {"content-type": "image/jpeg"}
+            )
+        except Exception:
+            logger.warning("Thumbnail upload failed for %s", path, exc_info=True)
+
+        try:
+            result = safe_execute(supabase.table("topup_requests").insert({
+                "user_id": job["user_id"],
+                "wallet_id": job["wallet_id"],
+                "amount": job["amount"],
+                "image_path": path,
+                "image_hash": job["image_hash"]
+            }), timeout=JOB_QUERY_TIMEOUT)
+        except APIError as e:
+            error_msg = str(e)
+            if "duplicate" in error_msg.lower() or "unique" in error_msg.lower():
+                remember_proof(job["image_hash"])
+                self._set_status(job, DUPLICATE, error="Duplicate payment proof detected")
+                return
+            self._set_status(job, FAILED, error=f"Failed to create topup request: {error_msg}")
+            return
+
+        remember_proof(job["image_hash"])
+        request_id = result.data[0]["id"] if result.data else None
+        self._set_status(job, PENDING, request_id=request_id)
+
+    # ---------- spool and status files ----------
+
+    def _status_path(self, job_id):
+        return os.path.join(self.spool_dir, f"{job_id}.json")
+
+    def _job_path(self, job_id):
+        return os.path.join(self.spool_dir, f"{job_id}.job")
+
+    def _write_job(self, job):
+        tmp_path = self._job_path(job["job_id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({**job, "pid": os.getpid()}, f)
+        os.replace(tmp_path, self._job_path(job["job_id"]))
+
+    def _set_status(self, job, status, **extra):
+        record = {
+            "job_id": job["job_id"],
+            "user_id": job["user_id"],
+            "status": status,
+            "updated_at": time.time(),
+            **extra
+        }
+        tmp_path = self._status_path(job["job_id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._status_path(job["job_id"]))
+
+    def _discard(self, job):
+        self._owned.discard(job["job_id"])
+        for path in (job["spool_path"], self._job_path(job["job_id"])):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _sweep(self):
+        """
+        At most once a minute: re-queue orphaned jobs and drop status files
+        (and uploads without a job descriptor) older than STATUS_TTL_SECONDS.
+        """
+        now = time.time()
+        # A new process (restarted worker) recovers right away
+        if self._recovered_pid == os.getpid() and now - self._last_sweep < 60:
+            return
+        self._recovered_pid = os.getpid()
+        self._last_sweep = now
+        self.recover()
+
+        names = os.listdir(self.spool_dir)
+        live = {name[:-len(".job")] for name in names if name.endswith(".job")}
+        for name in names:
+            job_id, _, ext = name.partition(".")
+            if ext not in ("json", "upload") or job_id in live:
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if now - os.path.getmtime(path) > STATUS_TTL_SECONDS:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+pipeline = TopupPipeline()
@@ -64,6 +64,14 @@ export const getPendingTopups = () => {
   return api.get("/admin/topup-requests");
 };
 
+/**
+ * Sign proof image URLs for many topup requests in one call
+ * POST /api/admin/topup-images
+ */
+export const signTopupImages = (paths) => {
+  return api.post("/admin/topup-images", { paths });
+};
+
 /**
  * Approve topup request
  * POST /api/admin/topup-approve
@@ -74,6 +82,16 @@ export const approveTopup = (requestId) => {
   });
 };
 
+/**
+ * Approve many topup requests (the server commits them 50 at a time)
+ * POST /api/admin/topup-approve-batch
+ */
+export const approveTopupsBatch = (requestIds) => {
+  return api.post("/admin/topup-approve-batch", {
+    request_ids: requestIds,
+  });
+};
+
 /* =====================================================
    🎮 PLAYS / TRANSACTIONS
 ===================================================== */
@@ -102,12 +120,26 @@ export const markAttendance = (data) => {
    🏆 LEADERBOARD
 ===================================================== */
 
-/**
- * Get leaderboard (admin allowed)
- * GET /api/visitor/leaderboard
- */
-export const getLeaderboard = () => {
-  return api.get("/visitor/leaderboard");
+const LEADERBOARD_PAGE_SIZE = 200;
+// Largest offset the API accepts
+const LEADERBOARD_MAX_OFFSET = 10000;
+
+/**
+ * Get the full leaderboard (admin allowed)
+ * GET /api/visitor/leaderboard, one page at a time
+ */
+export const getLeaderboard = async () => {
+  const rows = [];
+  let res;
+  for (let offset = 0; offset <= LEADERBOARD_MAX_OFFSET; offset += LEADERBOARD_PAGE_SIZE) {
+    res = await api.get("/visitor/leaderboard", {
+      params: { limit: LEADERBOARD_PAGE_SIZE, offset },
+    });
+    const page = res.data || [];
+    rows.push(...page);
+    if (page.length < LEADERBOARD_PAGE_SIZE) break;
+  }
+  return { ...res, data: rows };
 };
 
 
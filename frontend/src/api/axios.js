@@ -19,14 +19,58 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// One refresh at a time; concurrent 401s wait for the same promise
+let refreshPromise = null;
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem("refresh_token");
+    refreshPromise = axios
+      .post(`${baseURL}/auth/refresh`, { refresh_token: refreshToken })
+      .then((res) => {
+        localStorage.setItem("token", res.data.token);
+        if (res.data.refresh_token) {
+          localStorage.setItem("refresh_token", res.data.refresh_token);
+        }
+        api.defaults.headers.common.Authorization = `Bearer ${res.data.token}`;
+        return res.data.token;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Add response interceptor for better error handling
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config;
+
+    // Expired access token: trade the refresh token for a new one and retry once
+    if (
+      error.response?.status === 401 &&
+      original &&
+      !original._retried &&
+      !original.url?.startsWith("/auth/") &&
+      localStorage.getItem("refresh_token")
+    ) {
+      original._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        original.headers.Authorization = `Bearer ${token}`;
+        return api(original);
+      } catch (refreshError) {
+        // Fall through to logout below
+      }
+    }
+
     if (error.response?.status === 401) {
       console.warn("JWT expired or invalid. Logging out.");
 
       localStorage.removeItem("token");
+      localStorage.removeItem("refresh_token");
       localStorage.removeItem("user");
 
       // Prevent redirect loop
@@ -0,0 +1,73 @@
+const baseURL = process.env.REACT_APP_API_BASE_URL || "http://localhost:5000/api";
+
+/**
+ * Subscribe to a Server-Sent Events endpoint.
+ * Uses fetch instead of EventSource so the JWT can be sent as a header.
+ *
+ * @param {string} path - e.g. "/stall/stream"
+ * @param {Object} params - query params
+ * @param {Object} handlers - { onEvent(name, data), onOpen(), onError(err) }
+ * @returns {Function} call to close the stream (stops reconnecting)
+ */
+export const subscribe = (path, params, { onEvent, onOpen, onError }) => {
+  const controller = new AbortController();
+  let retryMs = 3000;
+  let closed = false;
+
+  const connect = async () => {
+    const url = new URL(baseURL + path);
+    Object.entries(params || {}).forEach(([key, value]) => {
+      if (value) url.searchParams.set(key, value);
+    });
+
+    try {
+      const token = localStorage.getItem("token");
+      const res = await fetch(url, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        signal: controller.signal,
+      });
+      if (!res.ok || !res.body) {
+        throw new Error(`Stream failed with status ${res.status}`);
+      }
+      onOpen && onOpen();
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let eventName = "message";
+          let data = "";
+          frame.split("\n").forEach((line) => {
+            if (line.startsWith("event:")) eventName = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+            else if (line.startsWith("retry:")) retryMs = parseInt(line.slice(6), 10) || retryMs;
+          });
+          if (data) onEvent(eventName, JSON.parse(data));
+        }
+      }
+    } catch (error) {
+      if (closed) return;
+      onError && onError(error);
+    }
+
+    // Server ends streams periodically; reconnect unless closed
+    if (!closed) setTimeout(connect, retryMs);
+  };
+
+  connect();
+
+  return () => {
+    closed = true;
+    controller.abort();
+  };
+};
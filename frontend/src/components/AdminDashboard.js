@@ -16,7 +16,9 @@ import {
   getAllUsers,
   getPlays,
   getPendingTopups,
+  signTopupImages,
   approveTopup,
+  approveTopupsBatch,
   getLeaderboard,
   markAttendance,
   getStalls,
@@ -43,6 +45,8 @@ const AdminDashboard = () => {
   const [users, setUsers] = useState([]);
   const [plays, setPlays] = useState([]);
   const [topupRequests, setTopupRequests] = useState([]);
+  // image_path -> { url, expiresAt } signed in one batch per topup page
+  const [topupImageUrls, setTopupImageUrls] = useState({});
   const [leaderboard, setLeaderboard] = useState([]);
   const [stalls, setStalls] = useState([]);
 
@@ -162,6 +166,24 @@ const AdminDashboard = () => {
         const res = await getPendingTopups();
         setTopupRequests(res.data || []);
         loadedData.topupRequests = res.data || [];
+
+        const paths = (res.data || [])
+          .flatMap((r) => [r.thumbnail_path, r.image_path])
+          .filter(Boolean);
+        if (paths.length > 0) {
+          signTopupImages(paths)
+            .then((signed) => {
+              const now = Date.now();
+              const urls = {};
+              Object.entries(signed.data.urls || {}).forEach(([path, item]) => {
+                urls[path] = { url: item.url, expiresAt: now + item.expires_in * 1000 };
+              });
+              setTopupImageUrls((prev) => ({ ...prev, ...urls }));
+            })
+            .catch(() => {
+              // Previews fall back to signing one image at a time
+            });
+        }
       }
 
       if (activeTab === "leaderboard") {
@@ -377,6 +399,18 @@ const AdminDashboard = () => {
     runAction(() => approveTopup(id), "Top-up approved");
   };
 
+  const handleApproveAllTopups = () => {
+    if (topupRequests.length === 0) return;
+    if (!window.confirm(`Approve all ${topupRequests.length} pending top-up requests?`)) return;
+
+    runAction(async () => {
+      const res = await approveTopupsBatch(topupRequests.map((r) => r.id));
+      if (res.data.failed > 0) {
+        throw new Error(`Approved ${res.data.approved}, ${res.data.failed} failed`);
+      }
+    }, "All top-ups approved");
+  };
+
   const handlePreviewImage = async (imagePath) => {
     if (!imagePath) {
       setMessage("No image available for this request");
@@ -384,6 +418,17 @@ const AdminDashboard = () => {
       return;
     }
 
+    const presigned = topupImageUrls[imagePath];
+    if (presigned && presigned.expiresAt - Date.now() > 60000) {
+      setPreviewImage({
+        url: presigned.url,
+        path: imagePath,
+        method: 'signed_url',
+        expires_in: Math.floor((presigned.expiresAt - Date.now()) / 1000)
+      });
+      return;
+    }
+
     setImageLoading(true);
     try {
       // Get the signed URL or base64 data for the image from private bucket
@@ -1074,6 +1119,14 @@ const AdminDashboard = () => {
             >
               🔍 Debug Storage
             </button>
+            <button
+              className="btn btn-success btn-sm"
+              onClick={handleApproveAllTopups}
+              disabled={isBusy || topupRequests.length === 0}
+              style={{ fontSize: '12px' }}
+            >
+              Approve All ({topupRequests.length})
+            </button>
           </div>
           
           {topupRequests.length === 0 ? (
@@ -1105,7 +1158,15 @@ const AdminDashboard = () => {
                         {new Date(r.created_at).toLocaleString()}
                       </td>
                       <td data-label="Payment Proof">
-                        {r.image_path ? (
+                        {r.image_path && topupImageUrls[r.thumbnail_path] ? (
+                          <img
+                            src={topupImageUrls[r.thumbnail_path].url}
+                            alt="Payment proof thumbnail"
+                            loading="lazy"
+                            onClick={() => handlePreviewImage(r.image_path)}
+                            style={{ width: '80px', height: 'auto', borderRadius: '4px', cursor: 'pointer' }}
+                          />
+                        ) : r.image_path ? (
                           <button
                             className="btn btn-secondary btn-sm"
                             onClick={() => handlePreviewImage(r.image_path)}
@@ -13,6 +13,7 @@
 
 import React, { useState, useEffect, useCallback, useRef } from "react";
 import api from "../api/axios";
+import { subscribe } from "../api/stream";
 import QRScanner from "./QRScanner";
 import QRDebugger from "./QRDebugger";
 import MessageAlert from "./MessageAlert";
@@ -30,6 +31,7 @@ const StallDashboard = () => {
   const [plays, setPlays] = useState([]);
   const [pendingGames, setPendingGames] = useState([]);
   const [wallet, setWallet] = useState(null);
+  const [streamConnected, setStreamConnected] = useState(false);
   const [activeStalls, setActiveStalls] = useState([]);
   const [selectedStallId, setSelectedStallId] = useState("");
   const [selectedPendingGame, setSelectedPendingGame] = useState(null);
@@ -216,7 +218,10 @@ const StallDashboard = () => {
   useEffect(() => {
     loadActiveStalls();
     loadHistory(selectedStallId);
-    
+
+    // Live updates come from /stall/stream; poll only while it is down
+    if (streamConnected) return undefined;
+
     // Auto-refresh every 30 seconds for real-time updates
     const interval = setInterval(() => {
       loadActiveStalls();
@@ -225,7 +230,37 @@ const StallDashboard = () => {
     }, 30000);
 
     return () => clearInterval(interval);
-  }, [loadActiveStalls, loadWallet, loadHistory, selectedStallId]);
+  }, [loadActiveStalls, loadWallet, loadHistory, selectedStallId, streamConnected]);
+
+  useEffect(() => {
+    if (!selectedStallId) return undefined;
+
+    const close = subscribe("/stall/stream", { stall_id: selectedStallId }, {
+      onOpen: () => setStreamConnected(true),
+      onError: () => setStreamConnected(false),
+      onEvent: (name, data) => {
+        if (name === "pending_game") {
+          loadPendingGames(selectedStallId);
+        } else if (name === "score") {
+          loadPendingGames(selectedStallId);
+          loadHistory(selectedStallId);
+        } else if (name === "wallet") {
+          setWallet((prev) =>
+            prev && prev.wallet_id === data.wallet_id ? { ...prev, balance: data.balance } : prev
+          );
+        } else if (name === "resync") {
+          loadPendingGames(selectedStallId);
+          loadHistory(selectedStallId);
+          loadWallet(selectedStallId);
+        }
+      },
+    });
+
+    return () => {
+      close();
+      setStreamConnected(false);
+    };
+  }, [selectedStallId, loadPendingGames, loadHistory, loadWallet]);
 
   useEffect(() => {
     loadWallet(selectedStallId);
@@ -12,6 +12,8 @@ const VisitorDashboard = () => {
   const [me, setMe] = useState(null);
   const [wallet, setWallet] = useState(null);
   const [history, setHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
+  const [historyLatest, setHistoryLatest] = useState(null);
   const [leaderboard, setLeaderboard] = useState([]);
   const [message, setMessage] = useState("");
   const [messageType, setMessageType] = useState("info");
@@ -70,10 +72,34 @@ const VisitorDashboard = () => {
     }
   };
 
+  // History is keyset paginated: the first call loads the newest page,
+  // later calls fetch only rows newer than the last one seen (since=).
   const loadHistory = async () => {
     try {
+      if (historyLatest) {
+        const res = await api.get("/visitor/history", { params: { since: historyLatest } });
+        if (res.data && res.data.length > 0) {
+          setHistory(prev => [...res.data, ...prev]);
+        }
+        setHistoryLatest(res.headers["x-latest-cursor"] || historyLatest);
+        return;
+      }
+
       const res = await api.get("/visitor/history");
       setHistory(res.data || []);
+      setHistoryCursor(res.headers["x-next-cursor"] || null);
+      setHistoryLatest(res.headers["x-latest-cursor"] || null);
+    } catch {
+      // Silent fail for history
+    }
+  };
+
+  const loadOlderHistory = async () => {
+    if (!historyCursor) return;
+    try {
+      const res = await api.get("/visitor/history", { params: { cursor: historyCursor } });
+      setHistory(prev => [...prev, ...(res.data || [])]);
+      setHistoryCursor(res.headers["x-next-cursor"] || null);
     } catch {
       // Silent fail for history
     }
@@ -118,14 +144,44 @@ const VisitorDashboard = () => {
       formData.append('image', topupImage);
       formData.append('amount', topupAmount);
 
-      await api.post("/visitor/topup-request", formData, {
+      const res = await api.post("/visitor/topup-request", formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
       });
 
-      setMessage("Topup request submitted successfully! Admin will review within 24 hours.");
-      setMessageType("success");
+      // The image is processed in the background; wait for the outcome
+      const jobId = res.data?.job_id;
+      let confirmed = !jobId;
+      if (jobId) {
+        setMessage("Processing payment proof...");
+        for (let attempt = 0; attempt < 20; attempt++) {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          let job;
+          try {
+            job = (await api.get(`/visitor/topup-request/${jobId}`)).data;
+          } catch (pollErr) {
+            // Status lives on the server that took the upload; stop waiting
+            break;
+          }
+          if (job.status === "duplicate" || job.status === "failed") {
+            throw new Error(job.error || "Failed to submit topup request");
+          }
+          if (job.status === "pending") {
+            confirmed = true;
+            break;
+          }
+        }
+      }
+
+      if (confirmed) {
+        setMessage("Topup request submitted successfully! Admin will review within 24 hours.");
+        setMessageType("success");
+      } else {
+        // Accepted but not confirmed yet: do not claim success or invite a resubmit
+        setMessage("Your payment proof was received and is still processing. Check back later before submitting it again.");
+        setMessageType("warning");
+      }
       setTopupImage(null);
       setTopupAmount(50);
       
@@ -134,7 +190,7 @@ const VisitorDashboard = () => {
       if (fileInput) fileInput.value = '';
       
       // Auto-hide success message after 5 seconds
-      setTimeout(() => setMessage(""), 5000);
+      if (confirmed) setTimeout(() => setMessage(""), 5000);
       
     } catch (err) {
       let errorMsg = "Failed to submit topup request";
@@ -430,6 +486,13 @@ const VisitorDashboard = () => {
                   ))}
                 </tbody>
               </table>
+              {historyCursor && (
+                <div className="text-center p-lg">
+                  <button className="btn btn-sm btn-secondary" onClick={loadOlderHistory}>
+                    Load older transactions
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
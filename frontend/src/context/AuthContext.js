@@ -30,7 +30,8 @@ useEffect(() => {
     const userData = localStorage.getItem("user");
   
     if (token && userData) {
-      if (isTokenExpired(token)) {
+      // An expired access token is refreshed on the first 401 if possible
+      if (isTokenExpired(token) && !localStorage.getItem('refresh_token')) {
         logout(); // force logout
       } else {
         setUser(JSON.parse(userData));
@@ -48,10 +49,11 @@ useEffect(() => {
         password: password.trim()
       });
 
-      const { token, role } = response.data;
+      const { token, refresh_token, role } = response.data;
       
       // Set the token first
       localStorage.setItem('token', token);
+      if (refresh_token) localStorage.setItem('refresh_token', refresh_token);
       api.defaults.headers.common['Authorization'] = `Bearer ${token}`;
       
       // Now fetch complete user data including user_id
@@ -80,7 +82,17 @@ useEffect(() => {
   };
 
   const logout = () => {
+    // Revoke the token server-side; the local session ends either way
+    const token = localStorage.getItem('token');
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (token && !isTokenExpired(token)) {
+      api.post('/auth/logout', { refresh_token: refreshToken }, {
+        headers: { Authorization: `Bearer ${token}` }
+      }).catch(() => {});
+    }
+
     localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user');
     delete api.defaults.headers.common['Authorization'];
     setUser(null);
@@ -106,9 +118,10 @@ useEffect(() => {
   const loginWithGoogle = async (googleToken) => {
     try {
       const response = await api.post('/auth/google', { token: googleToken });
-      const { token, role } = response.data;
+      const { token, refresh_token, role } = response.data;
       
       localStorage.setItem('token', token);
+      if (refresh_token) localStorage.setItem('refresh_token', refresh_token);
       api.defaults.headers.common['Authorization'] = `Bearer ${token}`;
       
       // Fetch full user data (same logic as your standard login)